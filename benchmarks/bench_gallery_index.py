@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Gallery index benchmark: exact scan vs IVF approximate search
+Reports recall@1 against the exact scan and per-query latency so the
+FACE_INDEX_MODE / FACE_INDEX_NPROBE settings can be picked per deployment.
+
+Usage:
+    python benchmarks/bench_gallery_index.py --sizes 10000 100000 --nprobe 4 8 16
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_gallery(size, dim=128, seed=0):
+    """Random identities scaled like dlib encodings (unit-ish norm)"""
+    rng = np.random.default_rng(seed)
+    identities = rng.normal(0.0, 1.0 / np.sqrt(dim), size=(size, dim)).astype(np.float32)
+    names = [f"person_{i}" for i in range(size)]
+    return names, identities
+
+
+def synthetic_queries(identities, count, noise=0.03, seed=1):
+    """Noisy re-captures of randomly chosen enrolled identities"""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(identities), size=count)
+    queries = identities[picks] + rng.normal(0.0, noise, size=(count, identities.shape[1])).astype(np.float32)
+    return queries
+
+
+def time_queries(gallery, queries, **match_kwargs):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(gallery.match(query, **match_kwargs)[0])
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000.0
+    return results, {
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99))
+    }
+
+
+def run(sizes, nprobes, nlist, queries_per_size):
+    from pythonAI_server import FaceGallery, IVFIndex
+
+    report = []
+    for size in sizes:
+        names, identities = synthetic_gallery(size)
+        queries = synthetic_queries(identities, queries_per_size)
+
+        exact_gallery = FaceGallery()
+        exact_gallery.load(names, identities)
+        exact_results, exact_timing = time_queries(exact_gallery, queries, exact=True)
+        print(f"[{size:>7}] exact        p50 {exact_timing['p50_ms']:.3f} ms  p95 {exact_timing['p95_ms']:.3f} ms")
+        report.append({"size": size, "mode": "exact", "recall_at_1": 1.0, **exact_timing})
+
+        index = IVFIndex(nlist=nlist, min_train_size=1)
+        ivf_gallery = FaceGallery(index=index)
+        build_start = time.perf_counter()
+        ivf_gallery.load(names, identities)
+        ivf_gallery.wait_for_index()
+        build_ms = (time.perf_counter() - build_start) * 1000.0
+
+        for nprobe in nprobes:
+            ivf_results, ivf_timing = time_queries(ivf_gallery, queries, nprobe=nprobe)
+            recall = float(np.mean([a == b for a, b in zip(ivf_results, exact_results)]))
+            print(f"[{size:>7}] ivf nprobe={nprobe:<3} p50 {ivf_timing['p50_ms']:.3f} ms  "
+                  f"p95 {ivf_timing['p95_ms']:.3f} ms  recall@1 {recall:.3f}  (build {build_ms:.0f} ms)")
+            report.append({
+                "size": size,
+                "mode": "ivf",
+                "nprobe": nprobe,
+                "nlist": len(ivf_gallery.index.centroids),
+                "build_ms": build_ms,
+                "recall_at_1": recall,
+                **ivf_timing
+            })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark exact vs IVF gallery matching")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[4, 8, 16, 32])
+    parser.add_argument('--nlist', type=int, default=0, help="0 = auto (4 * sqrt(size))")
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    # The server creates its database and gallery in the working directory on import
+    args.json = os.path.abspath(args.json) if args.json else None
+    os.chdir(tempfile.mkdtemp(prefix='eco_home_bench_'))
+    os.environ['STREAM_RECOGNITION'] = '0'
+    os.environ.setdefault('RETENTION_DAYS', '0')
+
+    report = run(args.sizes, args.nprobe, args.nlist, args.queries)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the recognition, enrollment, liveness and logging hot paths
+Builds synthetic galleries, replays a fixed JPEG corpus through the pipeline
+functions and the Flask endpoints, and reports p50/p95/p99 latency,
+throughput and resident memory per benchmark (RSS before, peak sampled during,
+and growth). Stage means come from the server's own /metrics histograms.
+
+--stand-ins replaces face_recognition and MediaPipe with cheap deterministic
+fakes so gallery matching, decoding, SQLite and HTTP overhead can be measured
+without the models (or on machines where dlib is not installed).
+
+Usage:
+    python benchmarks/bench_suite.py --sizes 10 1000 10000 100000 --json results.json
+    python benchmarks/bench_suite.py --stand-ins --corpus path/to/jpegs --baseline old.json
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import types
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import numpy as np
+import cv2
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def install_stand_ins():
+    """Register fake face_recognition / mediapipe modules in sys.modules"""
+
+    def face_locations(img, model="hog", number_of_times_to_upsample=1):
+        height, width = img.shape[:2]
+        return [(height // 4, 3 * width // 4, 3 * height // 4, width // 4)]
+
+    def face_encodings(img, known_face_locations=None, num_jitters=1, model="small"):
+        boxes = known_face_locations or face_locations(img)
+        encodings = []
+        for top, right, bottom, left in boxes:
+            crop = img[top:bottom, left:right]
+            rng = np.random.default_rng(int(crop.mean() * 1000) if crop.size else 0)
+            encodings.append(rng.normal(0.0, 0.09, 128))
+        return encodings
+
+    def face_distance(face_encodings, face_to_compare):
+        return np.linalg.norm(np.asarray(face_encodings) - face_to_compare, axis=1)
+
+    fake_fr = types.ModuleType('face_recognition')
+    fake_fr.face_locations = face_locations
+    fake_fr.face_encodings = face_encodings
+    fake_fr.face_distance = face_distance
+
+    class Landmark:
+        __slots__ = ('x', 'y', 'z')
+
+        def __init__(self, x, y):
+            self.x, self.y, self.z = x, y, 0.0
+
+    rng = np.random.default_rng(7)
+    mesh = [Landmark(0.3 + 0.4 * x, 0.25 + 0.5 * y) for x, y in rng.uniform(0.0, 1.0, size=(478, 2))]
+
+    class FaceMesh:
+        def __init__(self, **kwargs):
+            pass
+
+        def process(self, rgb):
+            return types.SimpleNamespace(multi_face_landmarks=[types.SimpleNamespace(landmark=mesh)])
+
+        def close(self):
+            pass
+
+    class FaceDetection:
+        def __init__(self, **kwargs):
+            pass
+
+        def process(self, rgb):
+            box = types.SimpleNamespace(xmin=0.25, ymin=0.25, width=0.5, height=0.5)
+            detection = types.SimpleNamespace(
+                score=[0.9],
+                location_data=types.SimpleNamespace(relative_bounding_box=box)
+            )
+            return types.SimpleNamespace(detections=[detection])
+
+        def close(self):
+            pass
+
+    solutions = types.SimpleNamespace(
+        face_mesh=types.SimpleNamespace(FaceMesh=FaceMesh),
+        face_detection=types.SimpleNamespace(FaceDetection=FaceDetection),
+        drawing_utils=types.SimpleNamespace()
+    )
+    fake_mp = types.ModuleType('mediapipe')
+    fake_mp.solutions = solutions
+
+    sys.modules['face_recognition'] = fake_fr
+    sys.modules['mediapipe'] = fake_mp
+
+
+def synthetic_corpus(count, seed=0, size=(480, 640)):
+    """Deterministic face-like JPEGs: shaded head, eyes and mouth over a noisy background"""
+    rng = np.random.default_rng(seed)
+    height, width = size
+    corpus = []
+    for i in range(count):
+        image = rng.integers(60, 200, size=(height // 8, width // 8, 3), dtype=np.uint8)
+        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_CUBIC)
+        center = (width // 2 + int(rng.integers(-40, 40)), height // 2 + int(rng.integers(-30, 30)))
+        axes = (int(rng.integers(90, 130)), int(rng.integers(120, 160)))
+        skin = tuple(int(c) for c in rng.integers(120, 220, size=3))
+        cv2.ellipse(image, center, axes, 0, 0, 360, skin, -1)
+        for dx in (-axes[0] // 2, axes[0] // 2):
+            cv2.circle(image, (center[0] + dx, center[1] - axes[1] // 4), 12, (40, 30, 30), -1)
+        cv2.ellipse(image, (center[0], center[1] + axes[1] // 2), (axes[0] // 3, 10), 0, 0, 180, (60, 40, 120), 3)
+        ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        corpus.append(encoded.tobytes())
+    return corpus
+
+
+def load_corpus(directory):
+    paths = sorted(glob.glob(os.path.join(directory, '*.jpg')) + glob.glob(os.path.join(directory, '*.jpeg')))
+    corpus = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            corpus.append(f.read())
+    return corpus
+
+
+def synthetic_gallery(size, dim=128, seed=0):
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0.0, 0.09, size=(size, dim)).astype(np.float32)
+    return [f"person_{i}" for i in range(size)], encodings
+
+
+def process_peak_rss_mb():
+    """High-water mark of the whole process so far; it never falls, so it is not per benchmark"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def current_rss_mb():
+    """Resident set size right now (psutil when installed, else /proc on Linux)"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024.0 * 1024.0)
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024.0 * 1024.0)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class RSSTracker:
+    """RSS before a benchmark and the peak sampled while it runs"""
+
+    def __init__(self):
+        self.before = self.peak = current_rss_mb()
+
+    def sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def fields(self):
+        self.sample()
+        return {
+            "rss_before_mb": self.before,
+            "peak_rss_mb": self.peak,
+            "rss_growth_mb": self.peak - self.before if self.before is not None else None,
+            "process_peak_rss_mb": process_peak_rss_mb()
+        }
+
+
+def measure(name, fn, inputs, size=None, warmup=2):
+    """Run fn over inputs, returning a result row with latency percentiles and RSS growth"""
+    rss = RSSTracker()
+    for item in inputs[:warmup]:
+        fn(item)
+    latencies = []
+    sampling = 0.0
+    wall_start = time.perf_counter()
+    for item in inputs:
+        start = time.perf_counter()
+        fn(item)
+        end = time.perf_counter()
+        latencies.append(end - start)
+        rss.sample()
+        sampling += time.perf_counter() - end
+    # RSS sampling is kept out of both the latencies and the throughput
+    wall = time.perf_counter() - wall_start - sampling
+    latencies = np.array(latencies) * 1000.0
+    row = {
+        "benchmark": name,
+        "size": size,
+        "n": len(inputs),
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "throughput_per_s": len(inputs) / wall if wall > 0 else 0.0,
+        **rss.fields()
+    }
+    label = f"{name}" + (f" [{size}]" if size is not None else "")
+    growth = f"  rss {row['rss_growth_mb']:+7.1f} MB" if row['rss_growth_mb'] is not None else ""
+    print(f"{label:<34} p50 {row['p50_ms']:8.3f} ms  p95 {row['p95_ms']:8.3f} ms  "
+          f"p99 {row['p99_ms']:8.3f} ms  {row['throughput_per_s']:9.1f}/s{growth}")
+    return row
+
+
+def stage_means(server):
+    """Mean ms and count per pipeline stage from the server's metrics registry"""
+    stages = {}
+    for sample_name, key, value in server.STAGE_SECONDS.samples():
+        if sample_name.endswith('_sum'):
+            stages.setdefault(key[0], {})["total_ms"] = value * 1000.0
+        elif sample_name.endswith('_count'):
+            stages.setdefault(key[0], {})["count"] = int(value)
+    return {
+        stage: {"count": values["count"], "mean_ms": values["total_ms"] / values["count"] if values["count"] else 0.0}
+        for stage, values in sorted(stages.items())
+    }
+
+
+def run(args, corpus):
+    import pythonAI_server as server
+
+    face_system = server.face_system
+    deadline = time.time() + 300
+    while not face_system.readiness.ready and time.time() < deadline:
+        time.sleep(0.05)
+    cold_start = face_system.readiness.snapshot()
+    print(f"Cold start: {cold_start['cold_start_seconds'] or float('nan'):.2f}s")
+    images = [server.decode_image_bytes(data) for data in corpus]
+    images = [image for image in images if image is not None]
+    client = server.app.test_client()
+    rng = random.Random(args.seed)
+    results = [{
+        "benchmark": "cold_start",
+        "seconds": cold_start["cold_start_seconds"],
+        "components": {name: state["seconds"] for name, state in cold_start["components"].items()},
+        "rss_mb": current_rss_mb(),
+        "process_peak_rss_mb": process_peak_rss_mb()
+    }]
+
+    # Size-independent stages
+    results.append(measure("decode_image_bytes", server.decode_image_bytes, corpus))
+    results.append(measure("detect_liveness", face_system.detect_liveness, images))
+    results.append(measure("extract_face_encoding", face_system.extract_face_encoding, images))
+    results.append(measure("log_recognition (enqueue)",
+                           lambda i: face_system.log_recognition(f"person_{i}", 0.8, "bench_domain"),
+                           list(range(args.iterations))))
+
+    rss = RSSTracker()
+    start = time.perf_counter()
+    face_system.log_writer.stop()
+    flushed = face_system.log_writer.written
+    results.append({
+        "benchmark": "log_writer_flush",
+        "n": flushed,
+        "throughput_per_s": flushed / max(time.perf_counter() - start, 1e-9),
+        **rss.fields()
+    })
+    face_system.log_writer = server.LogWriter(face_system.db)
+
+    for count in (2, 5):
+        batches = [[corpus[(i + j) % len(corpus)] for j in range(count)] for i in range(args.enrollments)]
+        names = iter(f"bench_enroll_{count}_{i}" for i in range(args.enrollments * 4))
+        results.append(measure(f"enroll_face ({count} images)",
+                               lambda batch: face_system.enroll_face(batch, next(names)), batches, size=count))
+        client_names = iter(f"bench_http_{count}_{i}" for i in range(args.enrollments * 4))
+
+        def post_enroll(batch):
+            files = {'name': next(client_names)}
+            for j, data in enumerate(batch):
+                files['image' if j == 0 else f'image{j}'] = (_bytes_io(data), 'image.jpg')
+            return client.post('/enroll', data=files, content_type='multipart/form-data')
+
+        results.append(measure(f"POST /enroll ({count} images)", post_enroll, batches, size=count))
+
+    for size in args.sizes:
+        names, encodings = synthetic_gallery(size, seed=args.seed)
+        rss = RSSTracker()
+        start = time.perf_counter()
+        face_system.gallery.load(names, encodings)
+        face_system.gallery.wait_for_index()
+        results.append({
+            "benchmark": "gallery.load",
+            "size": size,
+            "seconds": time.perf_counter() - start,
+            **rss.fields()
+        })
+        if results[-1]["rss_growth_mb"] is not None:
+            print(f"{f'gallery.load [{size}]':<34} {results[-1]['seconds'] * 1000.0:8.1f} ms  "
+                  f"rss {results[-1]['rss_growth_mb']:+7.1f} MB")
+        queries = encodings[[rng.randrange(size) for _ in range(args.iterations)]] + np.float32(0.01)
+
+        results.append(measure("gallery.match", face_system.gallery.match, list(queries), size=size))
+        frames = [images[i % len(images)] for i in range(args.iterations)]
+        results.append(measure("recognize_face", lambda image: face_system.recognize_face(image, "bench_domain"),
+                               frames, size=size))
+        payloads = [corpus[i % len(corpus)] for i in range(args.iterations)]
+        results.append(measure("POST /recognize",
+                               lambda data: client.post('/recognize', data={'image': (_bytes_io(data), 'image.jpg')},
+                                                        content_type='multipart/form-data'),
+                               payloads, size=size))
+
+    face_system.log_writer.stop()
+    results.append(measure("GET /logs", lambda _: client.get('/logs?limit=100'), list(range(args.iterations // 4 or 1))))
+    results.append(measure("GET /domain/stats", lambda _: client.get('/domain/stats'), list(range(args.iterations // 4 or 1))))
+    results.append(measure("GET /health", lambda _: client.get('/health'), list(range(args.iterations // 4 or 1))))
+
+    return results, stage_means(server)
+
+
+def _bytes_io(data):
+    from io import BytesIO
+    return BytesIO(data)
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(row["benchmark"], row.get("size")): row for row in baseline.get("results", [])}
+    print(f"\nChange vs {baseline_path} (negative is faster):")
+    for row in results:
+        old = previous.get((row["benchmark"], row.get("size")))
+        if not old or "p50_ms" not in row or not old.get("p50_ms"):
+            continue
+        p50 = (row["p50_ms"] / old["p50_ms"] - 1.0) * 100.0
+        p95 = (row["p95_ms"] / old["p95_ms"] - 1.0) * 100.0 if old.get("p95_ms") else 0.0
+        label = row["benchmark"] + (f" [{row['size']}]" if row.get("size") is not None else "")
+        print(f"  {label:<34} p50 {p50:+7.1f}%  p95 {p95:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recognition, enrollment, liveness and logging paths")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000, 100000])
+    parser.add_argument('--corpus', help="Directory of face JPEGs (default: synthetic corpus)")
+    parser.add_argument('--corpus-size', type=int, default=32)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--enrollments', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stand-ins', action='store_true', help="Fake face_recognition/MediaPipe models")
+    parser.add_argument('--keep-caches', action='store_true', help="Leave the result cache and face tracker enabled")
+    parser.add_argument('--json', help="Write results to this file")
+    parser.add_argument('--baseline', help="Previous --json output to compare against")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.corpus_size, seed=args.seed)
+    if not corpus:
+        parser.error(f"No JPEGs found in {args.corpus}")
+
+    if args.stand_ins:
+        install_stand_ins()
+
+    # Output paths are resolved before moving into the scratch directory
+    args.json = os.path.abspath(args.json) if args.json else None
+    args.baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    # The server creates its database and gallery in the working directory on import
+    workdir = tempfile.mkdtemp(prefix='eco_home_bench_')
+    os.chdir(workdir)
+    os.environ.setdefault('GALLERY_PATH', os.path.join(workdir, 'face_gallery'))
+    os.environ.setdefault('RETENTION_DAYS', '0')
+    os.environ['STREAM_RECOGNITION'] = '0'
+    if not args.keep_caches:
+        os.environ['RESULT_CACHE'] = '0'
+        os.environ['FACE_TRACKING'] = '0'
+    log_level = os.getenv('BENCH_LOG_LEVEL', 'WARNING')
+    logging.basicConfig(level=log_level)
+    logging.getLogger('pythonAI_server').setLevel(log_level)
+
+    print(f"Corpus: {len(corpus)} images, workdir {workdir}, stand-ins {'on' if args.stand_ins else 'off'}")
+    results, stages = run(args, corpus)
+
+    print("\nStage means (from /metrics histograms):")
+    for stage, values in stages.items():
+        print(f"  {stage:<22} {values['mean_ms']:8.3f} ms  x{values['count']}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+    if args.json:
+        report = {
+            "meta": {
+                "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "numpy": np.__version__,
+                "opencv": cv2.__version__,
+                "stand_ins": args.stand_ins,
+                "corpus": args.corpus or f"synthetic:{args.corpus_size}:{args.seed}",
+                "iterations": args.iterations,
+                "sizes": args.sizes
+            },
+            "results": results,
+            "stages": stages
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
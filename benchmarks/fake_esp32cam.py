@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Stand-in ESP32-CAM HTTP server for local load tests
+Serves the same endpoints as arduino/esp32cam_security.ino: /capture (one
+JPEG), /status (device JSON) and /stream (MJPEG, boundary "frame") from a
+fixed synthetic corpus, with optional capture latency to mimic the sensor.
+
+Point the AI server at it with ESP32_CAM_IP=127.0.0.1:8081.
+
+Usage:
+    python benchmarks/fake_esp32cam.py --port 8081 --fps 10 --capture-delay 0.08
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_suite import synthetic_corpus
+
+
+class FakeCamera:
+    """Frame source and counters shared by all request handlers"""
+
+    def __init__(self, corpus, fps=10.0, capture_delay=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.corpus = corpus
+        self.frame_interval = 1.0 / fps if fps > 0 else 0.0
+        self.capture_delay = capture_delay
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.started = time.time()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"totalRequests": 0, "totalFrames": 0, "activeStreams": 0, "totalClients": 0, "errorCount": 0}
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def next_frame(self):
+        with self._lock:
+            frame = self.corpus[self.stats["totalFrames"] % len(self.corpus)]
+            self.stats["totalFrames"] += 1
+            delay = self.capture_delay + self._random.uniform(0.0, self.jitter)
+            fail = self._random.random() < self.error_rate
+        return frame, delay, fail
+
+    def status(self):
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            "deviceID": "FAKE-ESP32-CAM",
+            "localIP": "127.0.0.1",
+            "version": "fake",
+            "camera": True,
+            "wifi": True,
+            "uptime": int(time.time() - self.started),
+            "freeHeap": 150000,
+            "maxClients": 4,
+            **stats
+        }
+
+
+def make_handler(camera):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            camera.count("totalRequests")
+            path = self.path.split('?', 1)[0]
+            if path == '/capture':
+                self.capture()
+            elif path == '/status':
+                self.send_body(200, 'application/json', json.dumps(camera.status()).encode())
+            elif path == '/stream':
+                self.stream()
+            else:
+                self.send_body(404, 'text/plain', b'Not found')
+
+        def do_HEAD(self):
+            camera.count("totalRequests")
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def send_body(self, status, content_type, body, extra_headers=()):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            for name, value in extra_headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def capture(self):
+            frame, delay, fail = camera.next_frame()
+            if delay:
+                time.sleep(delay)
+            if fail:
+                camera.count("errorCount")
+                self.send_body(500, 'text/plain', b'Capture failed')
+                return
+            self.send_body(200, 'image/jpeg', frame, [('Content-Disposition', 'attachment; filename=capture.jpg')])
+
+        def stream(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=frame')
+            self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            camera.count("activeStreams")
+            camera.count("totalClients")
+            try:
+                while True:
+                    start = time.time()
+                    frame, _, _ = camera.next_frame()
+                    self.wfile.write(
+                        b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n' % len(frame)
+                        + frame + b'\r\n'
+                    )
+                    self.wfile.flush()
+                    time.sleep(max(0.0, camera.frame_interval - (time.time() - start)))
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                camera.count("activeStreams", -1)
+                self.close_connection = True
+
+    return Handler
+
+
+def start_camera(port=8081, host='127.0.0.1', corpus=None, **camera_kwargs):
+    """Run the fake camera on a daemon thread; returns (server, camera)"""
+    camera = FakeCamera(corpus or synthetic_corpus(16), **camera_kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(camera))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-esp32cam', daemon=True).start()
+    return server, camera
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in ESP32-CAM serving /capture, /status and /stream")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--fps', type=float, default=10.0, help="MJPEG stream frame rate")
+    parser.add_argument('--capture-delay', type=float, default=0.08, help="Seconds per /capture (sensor readout)")
+    parser.add_argument('--jitter', type=float, default=0.02, help="Extra random capture delay, seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of captures answered with 500")
+    parser.add_argument('--frames', type=int, default=16, help="Synthetic frames to cycle through")
+    args = parser.parse_args()
+
+    server, camera = start_camera(
+        args.port, args.host, synthetic_corpus(args.frames),
+        fps=args.fps, capture_delay=args.capture_delay, jitter=args.jitter, error_rate=args.error_rate
+    )
+    print(f"Fake ESP32-CAM on http://{args.host}:{args.port} (/capture, /status, /stream)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
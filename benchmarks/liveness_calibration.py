@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Calibration check for the liveness texture, edge-density and face-size thresholds
+score_liveness measures Laplacian variance and Canny edge density on the
+padded face crop, and the face box area as a share of the frame. This script
+computes the texture metrics both ways over a labelled sample (full frame with
+the old thresholds, padded crop with the server's current ones) and prints pass
+rates per label, plus the face-size pass rate, so a threshold change can be
+checked against the previous behaviour.
+
+Calibration needs labelled captures: --live DIR and --spoof DIR of JPEGs, with
+face boxes from the server's HOG detector (needs face_recognition). The server's
+current thresholds are provisional until they have been checked this way.
+
+Without captures a synthetic sample is built from one portrait (--portrait, or
+matplotlib's sample photo if matplotlib happens to be installed), composited
+into VGA-720p frames with print, screen-replay and out-of-focus variants. Every
+frame shows the same photo, so this is only a sharp-vs-blurred sanity check of
+the metrics, not a live-vs-spoof calibration.
+
+Usage:
+    python benchmarks/liveness_calibration.py --live captures/live --spoof captures/spoof
+    python benchmarks/liveness_calibration.py --portrait face.jpg --portrait-box 165 355 335 175
+"""
+
+import os
+import sys
+import glob
+import argparse
+import itertools
+import tempfile
+import numpy as np
+import cv2
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Thresholds used while the metrics were measured on the whole frame
+FULL_FRAME_TEXTURE_MIN = 40.0
+FULL_FRAME_EDGE_RANGE = (0.01, 0.25)
+
+# Face box of matplotlib's grace_hopper.jpg sample, (top, right, bottom, left)
+DEFAULT_PORTRAIT_BOX = (165, 355, 335, 175)
+
+
+def default_portrait():
+    """matplotlib's sample portrait when matplotlib is installed (it is not a server dependency)"""
+    try:
+        from matplotlib import cbook
+    except ImportError:
+        return None
+    return str(cbook.get_sample_data('grace_hopper.jpg', asfileobj=False))
+
+
+class SyntheticSample:
+    """Door-camera frames composited from one portrait, with degraded copies (sanity check only)"""
+
+    SIZES = [(480, 640), (600, 800), (720, 1280)]
+    FACE_WIDTHS = [90, 130, 180, 240]
+    BACKGROUNDS = ['wall', 'room', 'noise']
+    NOISE = [2, 5]
+    QUALITIES = [70, 85]
+    SPOOFS = ['print', 'screen', 'blur']
+
+    def __init__(self, portrait, box, seed=0):
+        self.portrait = portrait
+        self.box = box
+        self.rng = np.random.default_rng(seed)
+
+    def background(self, height, width, kind):
+        if kind == 'wall':
+            y = np.linspace(0.0, 1.0, height)[:, None]
+            x = np.linspace(0.0, 1.0, width)[None, :]
+            base = 150.0 + 40.0 * y + 20.0 * x
+            return np.dstack([base, base * 0.95, base * 0.9])
+        if kind == 'room':
+            image = np.full((height, width, 3), 170.0)
+            for _ in range(12):
+                x0, y0 = int(self.rng.integers(0, width)), int(self.rng.integers(0, height))
+                x1, y1 = x0 + int(self.rng.integers(30, 200)), y0 + int(self.rng.integers(30, 200))
+                colour = [float(c) for c in self.rng.integers(40, 230, 3)]
+                cv2.rectangle(image, (x0, y0), (x1, y1), colour, -1)
+            return cv2.GaussianBlur(image, (0, 0), 1.0)
+        small = self.rng.integers(60, 200, size=(height // 8, width // 8, 3)).astype(np.float64)
+        return cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+
+    def compose(self, height, width, face_width, kind):
+        """Frame with the portrait placed near the centre: (image, face box, portrait region)"""
+        top, right, bottom, left = self.box
+        scale = face_width / float(right - left)
+        portrait = cv2.resize(self.portrait, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA).astype(np.float64)
+        image = self.background(height, width, kind)
+        ph, pw = portrait.shape[:2]
+        ox = int(width / 2 - (left + right) / 2 * scale + self.rng.integers(-width // 8, width // 8))
+        oy = int(height / 2 - (top + bottom) / 2 * scale + self.rng.integers(-height // 10, height // 10))
+        x0, y0, x1, y1 = max(0, ox), max(0, oy), min(width, ox + pw), min(height, oy + ph)
+        image[y0:y1, x0:x1] = portrait[y0 - oy:y1 - oy, x0 - ox:x1 - ox]
+        face_box = (int(top * scale + oy), int(right * scale + ox), int(bottom * scale + oy), int(left * scale + ox))
+        return image, face_box, (y0, x1, y1, x0)
+
+    @staticmethod
+    def spoof(image, region, kind):
+        """Replace the portrait region with a printed, replayed or out-of-focus copy"""
+        top, right, bottom, left = region
+        patch = image[top:bottom, left:right]
+        if kind == 'print':
+            patch = cv2.GaussianBlur(128.0 + (patch - 128.0) * 0.6, (0, 0), 1.5)
+        elif kind == 'screen':
+            height, width = patch.shape[:2]
+            small = cv2.resize(patch, (max(1, width // 3), max(1, height // 3)), interpolation=cv2.INTER_AREA)
+            patch = cv2.GaussianBlur(cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR), (0, 0), 1.0) * 1.1
+        else:
+            patch = cv2.GaussianBlur(patch, (0, 0), 3.0)
+        image = image.copy()
+        image[top:bottom, left:right] = patch
+        return image
+
+    def finish(self, image, noise, quality):
+        """Sensor noise and a JPEG round trip, as the camera would deliver it"""
+        image = np.clip(image + self.rng.normal(0.0, noise, image.shape), 0, 255).astype(np.uint8)
+        ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+    def frames(self):
+        """(label, image, face box) for every combination"""
+        for (height, width), face_width, kind, noise, quality in itertools.product(
+                self.SIZES, self.FACE_WIDTHS, self.BACKGROUNDS, self.NOISE, self.QUALITIES):
+            image, box, region = self.compose(height, width, face_width, kind)
+            yield 'live', self.finish(image, noise, quality), box
+            for spoof in self.SPOOFS:
+                yield spoof, self.finish(self.spoof(image, region, spoof), noise, quality), box
+
+
+def labelled_frames(server, live_dir, spoof_dir):
+    """(label, image, face box) for captured JPEGs, boxes from the server's detector"""
+    for label, directory in (('live', live_dir), ('spoof', spoof_dir)):
+        if not directory:
+            continue
+        paths = sorted(glob.glob(os.path.join(directory, '*.jpg')) + glob.glob(os.path.join(directory, '*.jpeg')))
+        for path in paths:
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            box, _ = server.face_system.locate_face(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+            if box is None:
+                print(f"  no face: {path}")
+                continue
+            yield label, image, box
+
+
+def pass_rates(rows, system):
+    """Per label: full-frame (old) and crop (current) pass rates for texture, edge and both, plus face size"""
+    texture_min = system.TEXTURE_MIN_VARIANCE
+    edge_low, edge_high = system.EDGE_DENSITY_RANGE
+    summary = {}
+    for label in sorted({row[0] for row in rows}):
+        selected = [row for row in rows if row[0] == label]
+        old_texture = np.array([full[0] > FULL_FRAME_TEXTURE_MIN for _, full, _, _ in selected])
+        old_edge = np.array([FULL_FRAME_EDGE_RANGE[0] < full[1] < FULL_FRAME_EDGE_RANGE[1] for _, full, _, _ in selected])
+        new_texture = np.array([crop[0] > texture_min for _, _, crop, _ in selected])
+        new_edge = np.array([edge_low < crop[1] < edge_high for _, _, crop, _ in selected])
+        crop_edges = np.array([crop[1] for _, _, crop, _ in selected])
+        face_ratios = np.array([ratio for _, _, _, ratio in selected])
+        summary[label] = {
+            "n": len(selected),
+            "old": (old_texture.mean(), old_edge.mean(), (old_texture & old_edge).mean()),
+            "new": (new_texture.mean(), new_edge.mean(), (new_texture & new_edge).mean()),
+            "crop_edge_p5_p95": tuple(np.percentile(crop_edges, [5, 95])),
+            "face_size": (face_ratios > system.MIN_FACE_RATIO).mean(),
+            "face_ratio_p5": float(np.percentile(face_ratios, 5))
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-frame and face-crop liveness threshold pass rates")
+    parser.add_argument('--live', help="Directory of live captures")
+    parser.add_argument('--spoof', help="Directory of spoof captures (prints, screens)")
+    parser.add_argument('--portrait', default=default_portrait(), help="Portrait for the synthetic sample")
+    parser.add_argument('--portrait-box', type=int, nargs=4, default=DEFAULT_PORTRAIT_BOX,
+                        metavar=('TOP', 'RIGHT', 'BOTTOM', 'LEFT'))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    # The server creates its database and gallery in the working directory on import
+    os.chdir(tempfile.mkdtemp(prefix='eco_home_calibration_'))
+    os.environ['STREAM_RECOGNITION'] = '0'
+    os.environ.setdefault('RETENTION_DAYS', '0')
+    import pythonAI_server as server
+
+    if args.live or args.spoof:
+        frames = labelled_frames(server, args.live, args.spoof)
+    else:
+        portrait = cv2.imread(args.portrait) if args.portrait else None
+        if portrait is None:
+            parser.error("No portrait found; pass --live/--spoof, or --portrait and --portrait-box")
+        frames = SyntheticSample(portrait, tuple(args.portrait_box), seed=args.seed).frames()
+
+    system = server.FaceRecognitionSystem
+    rows = []
+    for label, image, box in frames:
+        full = system.texture_metrics(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+        crop = server.FaceAnalysis(image, None, box=box).padded_crop()
+        top, right, bottom, left = box
+        face_ratio = (right - left) * (bottom - top) / float(image.shape[0] * image.shape[1])
+        rows.append((label, full, system.texture_metrics(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)), face_ratio))
+    if not rows:
+        parser.error("No frames with a detectable face")
+
+    print(f"Full frame: variance > {FULL_FRAME_TEXTURE_MIN}, {FULL_FRAME_EDGE_RANGE[0]} < edge < {FULL_FRAME_EDGE_RANGE[1]}")
+    print(f"Face crop:  variance > {system.TEXTURE_MIN_VARIANCE}, "
+          f"{system.EDGE_DENSITY_RANGE[0]} < edge < {system.EDGE_DENSITY_RANGE[1]}")
+    print(f"Face size:  box area / frame > {system.MIN_FACE_RATIO}")
+    if not (args.live or args.spoof):
+        print("Synthetic sample: one photo throughout, so this checks sharp vs blurred, not live vs spoof")
+    print(f"\n{'label':<8} {'n':>5}   {'texture':>15} {'edge':>15} {'both':>15}   crop edge p5-p95   face size (p5 ratio)")
+    for label, stats in pass_rates(rows, system).items():
+        cells = [f"{old * 100:5.1f}% -> {new * 100:5.1f}%" for old, new in zip(stats["old"], stats["new"])]
+        low, high = stats["crop_edge_p5_p95"]
+        print(f"{label:<8} {stats['n']:>5}   {cells[0]:>15} {cells[1]:>15} {cells[2]:>15}   {low:.3f}-{high:.3f}"
+              f"        {stats['face_size'] * 100:5.1f}% ({stats['face_ratio_p5']:.3f})")
+
+
+if __name__ == '__main__':
+    main()
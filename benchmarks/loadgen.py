@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+End-to-end load generator for the AI server
+Simulates door/face-detect devices posting multipart JPEGs to /recognize and
+dashboards polling /proxy/capture, /list and /domain/stats, stepping the
+device count up to find the saturation point. Reports throughput, p50/p95/p99
+latency and error rate per endpoint and per step.
+
+Run the server against a fake camera, then drive it:
+    python benchmarks/fake_esp32cam.py --port 8081 &
+    ESP32_CAM_IP=127.0.0.1:8081 python pythonAI_server.py &
+    python benchmarks/loadgen.py --server http://127.0.0.1:5000 --steps 1 2 4 8 16 --dashboards 2
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_suite import synthetic_corpus, load_corpus
+from fake_esp32cam import start_camera
+
+DASHBOARD_ENDPOINTS = ('/proxy/capture', '/list', '/domain/stats')
+
+
+class Recorder:
+    """Latencies and outcomes per endpoint for one load step"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+
+    def record(self, endpoint, latency, status):
+        error = status is None or status >= 400
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(latency)
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + int(error)
+            key = f"{endpoint} {status if status is not None else 'exception'}"
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def summary(self, elapsed):
+        endpoints = {}
+        with self._lock:
+            items = {endpoint: list(values) for endpoint, values in self.latencies.items()}
+            errors = dict(self.errors)
+            statuses = dict(self.statuses)
+        total, total_errors = 0, 0
+        for endpoint, values in sorted(items.items()):
+            latencies = np.array(values) * 1000.0
+            total += len(values)
+            total_errors += errors.get(endpoint, 0)
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "throughput_per_s": len(values) / elapsed,
+                "error_rate": errors.get(endpoint, 0) / len(values),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+                "p99_ms": float(np.percentile(latencies, 99))
+            }
+        return {
+            "requests": total,
+            "throughput_per_s": total / elapsed,
+            "error_rate": total_errors / total if total else 0.0,
+            "endpoints": endpoints,
+            "statuses": statuses
+        }
+
+
+def timed(recorder, endpoint, call):
+    start = time.perf_counter()
+    try:
+        response = call()
+        status = response.status_code
+        response.content  # read the full body, as a device would
+    except requests.RequestException:
+        status = None
+    recorder.record(endpoint, time.perf_counter() - start, status)
+
+
+def device_client(index, args, corpus, recorder, stop):
+    """A door camera: post a frame, wait for the verdict, think, repeat"""
+    session = requests.Session()
+    headers = {'X-Camera-Id': f"loadgen-device-{index}", 'X-Domain-Used': 'api_domain'}
+    frame = index
+    while not stop.is_set():
+        data = corpus[frame % len(corpus)]
+        frame += 1
+        timed(recorder, '/recognize', lambda: session.post(
+            f"{args.server}/recognize",
+            files={'image': ('image.jpg', data, 'image/jpeg')},
+            headers=headers,
+            timeout=args.timeout
+        ))
+        if args.device_interval:
+            stop.wait(args.device_interval)
+
+
+def dashboard_client(index, args, recorder, stop):
+    """A dashboard tab: cycle through capture, face list and stats polls"""
+    session = requests.Session()
+    turn = index
+    while not stop.is_set():
+        endpoint = DASHBOARD_ENDPOINTS[turn % len(DASHBOARD_ENDPOINTS)]
+        turn += 1
+        timed(recorder, endpoint, lambda: session.get(f"{args.server}{endpoint}", timeout=args.timeout))
+        stop.wait(args.dashboard_interval)
+
+
+def run_step(devices, args, corpus):
+    recorder = Recorder()
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=device_client, args=(i, args, corpus, recorder, stop), daemon=True)
+        for i in range(devices)
+    ] + [
+        threading.Thread(target=dashboard_client, args=(i, args, recorder, stop), daemon=True)
+        for i in range(args.dashboards)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join(args.timeout + 1)
+    summary = recorder.summary(time.perf_counter() - start)
+    summary["devices"] = devices
+    summary["dashboards"] = args.dashboards
+    return summary
+
+
+def find_saturation(steps, slo_ms, min_gain=0.05):
+    """Highest-throughput step before gains flatten or /recognize p99 breaks the SLO"""
+    best = None
+    for step in steps:
+        recognize = step["endpoints"].get('/recognize', {})
+        if slo_ms and recognize.get("p99_ms", 0.0) > slo_ms:
+            break
+        if best is not None and step["throughput_per_s"] < best["throughput_per_s"] * (1.0 + min_gain):
+            break
+        best = step
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive device and dashboard traffic against the AI server")
+    parser.add_argument('--server', default='http://127.0.0.1:5000')
+    parser.add_argument('--steps', type=int, nargs='+', default=[1, 2, 4, 8, 16], help="Concurrent devices per step")
+    parser.add_argument('--dashboards', type=int, default=2, help="Concurrent dashboard clients in every step")
+    parser.add_argument('--duration', type=float, default=20.0, help="Seconds per step")
+    parser.add_argument('--device-interval', type=float, default=0.0, help="Device think time (0 = closed loop)")
+    parser.add_argument('--dashboard-interval', type=float, default=1.0, help="Seconds between dashboard polls")
+    parser.add_argument('--timeout', type=float, default=15.0, help="Per-request timeout (devices use 15 s)")
+    parser.add_argument('--slo-ms', type=float, default=0.0, help="/recognize p99 budget for the saturation point")
+    parser.add_argument('--corpus', help="Directory of face JPEGs (default: synthetic corpus)")
+    parser.add_argument('--camera-port', type=int, default=0, help="Also run a fake ESP32-CAM on this port")
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+    args.server = args.server.rstrip('/')
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(32)
+    if not corpus:
+        parser.error(f"No JPEGs found in {args.corpus}")
+
+    if args.camera_port:
+        start_camera(args.camera_port, corpus=corpus)
+        print(f"Fake ESP32-CAM on 127.0.0.1:{args.camera_port} (start the server with ESP32_CAM_IP=127.0.0.1:{args.camera_port})")
+
+    steps = []
+    for devices in args.steps:
+        step = run_step(devices, args, corpus)
+        steps.append(step)
+        recognize = step["endpoints"].get('/recognize', {})
+        print(f"devices {devices:>4}  {step['throughput_per_s']:8.1f} req/s  errors {step['error_rate'] * 100:5.1f}%  "
+              f"/recognize p50 {recognize.get('p50_ms', 0.0):8.1f} ms  p95 {recognize.get('p95_ms', 0.0):8.1f} ms  "
+              f"p99 {recognize.get('p99_ms', 0.0):8.1f} ms")
+        for endpoint in DASHBOARD_ENDPOINTS:
+            stats = step["endpoints"].get(endpoint)
+            if stats:
+                print(f"    {endpoint:<16} p95 {stats['p95_ms']:8.1f} ms  errors {stats['error_rate'] * 100:5.1f}%")
+
+    saturation = find_saturation(steps, args.slo_ms)
+    if saturation:
+        print(f"Saturation: ~{saturation['throughput_per_s']:.1f} req/s at {saturation['devices']} devices "
+              f"+ {saturation['dashboards']} dashboards")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                "server": args.server,
+                "duration_s": args.duration,
+                "device_interval_s": args.device_interval,
+                "dashboard_interval_s": args.dashboard_interval,
+                "slo_ms": args.slo_ms,
+                "steps": steps,
+                "saturation": {
+                    "devices": saturation["devices"],
+                    "dashboards": saturation["dashboards"],
+                    "throughput_per_s": saturation["throughput_per_s"]
+                } if saturation else None
+            }, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,37 +11,2197 @@ import pickle
 import json
 import re
 import time
+import queue
+import atexit
+import threading
+import importlib
+import multiprocessing
+from multiprocessing import shared_memory
 import requests
-from flask import Flask, request, jsonify
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
-import face_recognition
-import mediapipe as mp
 from datetime import datetime
 import sqlite3
-import base64
+import binascii
 from io import BytesIO
 from PIL import Image
 import logging
+import bisect
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Cold-start clock for readiness reporting; the model imports are deferred (LazyModule below)
+_process_started = time.time()
+
 app = Flask(__name__)
 CORS(app)
 
-# Initialize MediaPipe
-mp_face_detection = mp.solutions.face_detection
-mp_face_mesh = mp.solutions.face_mesh
-mp_drawing = mp.solutions.drawing_utils
+# Whole-request cap (enrollment posts up to 10 images); larger bodies get a 413
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_REQUEST_MB', '40')) * 1024 * 1024
+
+class LazyModule:
+    """Module proxy that imports on first attribute access.
+
+    face_recognition loads its dlib models and MediaPipe its graphs at import
+    time, so they are deferred until a request or the warm-up thread needs
+    them. attribute selects a dotted path inside the module.
+    """
+
+    def __init__(self, name, attribute=None):
+        self._name = name
+        self._attribute = attribute
+        self._target = None
+
+    def _load(self):
+        if self._target is None:
+            target = importlib.import_module(self._name)
+            for part in (self._attribute.split('.') if self._attribute else ()):
+                target = getattr(target, part)
+            self._target = target
+        return self._target
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+face_recognition = LazyModule('face_recognition')
+
+# Initialize MediaPipe (imported on first use)
+mp_face_detection = LazyModule('mediapipe', 'solutions.face_detection')
+mp_face_mesh = LazyModule('mediapipe', 'solutions.face_mesh')
+mp_drawing = LazyModule('mediapipe', 'solutions.drawing_utils')
+
+# Spawned inference workers re-import this module; they only need the models,
+# not the database or the on-disk gallery (they read it from shared memory)
+IN_WORKER_PROCESS = multiprocessing.current_process().name != 'MainProcess'
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+class Gauge:
+    """Value read at scrape time from a callback returning a number or {label tuple: number}"""
+
+    def __init__(self, name, help_text, callback, labelnames=(), kind='gauge'):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def samples(self):
+        value = self.callback()
+        if isinstance(value, dict):
+            return [(self.name, tuple(str(v) for v in key), number) for key, number in value.items()]
+        return [(self.name, (), value)]
+
+class Histogram:
+    """Cumulative-bucket latency histogram with optional labels (seconds)"""
+
+    kind = 'histogram'
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label tuple -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        samples = []
+        for key, values in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key + ('+Inf' if bound == float('inf') else repr(bound),), cumulative))
+            samples.append((f"{self.name}_sum", key, values[-2]))
+            samples.append((f"{self.name}_count", key, values[-1]))
+        return samples
+
+class MetricsRegistry:
+    """Process-wide metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, callback, labelnames=(), kind='gauge'):
+        return self.register(Gauge(name, help_text, callback, labelnames, kind))
+
+    @staticmethod
+    def _escape(value):
+        return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.error(f"Metric {metric.name} collection error: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            labelnames = metric.labelnames + (('le',) if metric.kind == 'histogram' else ())
+            for sample_name, key, value in samples:
+                names = labelnames if len(key) == len(labelnames) else metric.labelnames
+                labels = ','.join(f'{label}="{self._escape(v)}"' for label, v in zip(names, key))
+                lines.append(f"{sample_name}{{{labels}}} {float(value)!r}" if labels else f"{sample_name} {float(value)!r}")
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+
+# Named pipeline stages: decode, liveness_facemesh, liveness_laplacian, liveness_canny,
+# detection, encoding, gallery_match, db_write, upstream_fetch, inference (process backend)
+STAGE_SECONDS = metrics.histogram('eco_home_stage_seconds', 'Latency of request pipeline stages', ('stage',))
+HTTP_REQUESTS = metrics.counter('eco_home_http_requests_total', 'HTTP requests by route and status', ('endpoint', 'method', 'status'))
+HTTP_SECONDS = metrics.histogram('eco_home_http_request_seconds', 'HTTP request latency by route', ('endpoint',))
+RECOGNITION_RESULTS = metrics.counter('eco_home_recognition_results_total', 'Recognition outcomes', ('result',))
+
+def timed_stage(stage):
+    """Context manager feeding STAGE_SECONDS for one pipeline stage"""
+    return STAGE_SECONDS.time(stage=stage)
+
+def nearest_row(matrix, sq_norms, query):
+    """Index and Euclidean distance of the row of matrix closest to query"""
+    # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2; the query norm is constant for argmin
+    partial = sq_norms - 2.0 * (matrix @ query)
+    best = int(np.argmin(partial))
+    return best, float(np.sqrt(max(partial[best] + query @ query, 0.0)))
+
+class Readiness:
+    """Startup state of each server component, reported by /ready.
+
+    Components are declared up front as pending and move to loading, then
+    ready or failed; cold_start is the time from process start until the last
+    declared component became ready.
+    """
+
+    def __init__(self, started=None):
+        self.started = started or time.time()
+        self.ready_at = None
+        self._components = {}
+        self._lock = threading.Lock()
+
+    def declare(self, *names):
+        with self._lock:
+            for name in names:
+                self._components.setdefault(name, {"status": "pending", "seconds": None, "error": None})
+
+    @contextmanager
+    def track(self, name, reraise=True):
+        self.declare(name)
+        with self._lock:
+            self._components[name]["status"] = "loading"
+        start = time.time()
+        try:
+            yield
+        except Exception as e:
+            with self._lock:
+                self._components[name].update(status="failed", seconds=time.time() - start, error=str(e))
+            logger.error(f"Startup component {name} failed: {e}")
+            if reraise:
+                raise
+        else:
+            with self._lock:
+                self._components[name].update(status="ready", seconds=time.time() - start)
+                if self.ready_at is None and all(c["status"] == "ready" for c in self._components.values()):
+                    self.ready_at = time.time()
+                    logger.info(f"Cold start: ready in {self.cold_start:.2f}s")
+
+    @property
+    def ready(self):
+        return self.ready_at is not None
+
+    @property
+    def cold_start(self):
+        return self.ready_at - self.started if self.ready_at is not None else None
+
+    def snapshot(self):
+        with self._lock:
+            components = {name: dict(state) for name, state in self._components.items()}
+        return {
+            "ready": self.ready,
+            "cold_start_seconds": self.cold_start,
+            "uptime_seconds": time.time() - self.started,
+            "components": components
+        }
+
+class ModelPool:
+    """Bounded pool of long-lived MediaPipe graph instances.
+
+    Building a FaceMesh graph costs far more than running it, so request threads
+    check instances out of this pool instead of constructing one per call. An
+    instance whose process() raises is closed and replaced lazily by a fresh one.
+    """
+
+    def __init__(self, name, factory, size=4):
+        self.name = name
+        self.factory = factory
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create(self):
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            return self.factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _discard(self, instance):
+        with self._lock:
+            self._created -= 1
+        try:
+            instance.close()
+        except Exception as e:
+            logger.warning(f"{self.name} pool: error closing instance: {e}")
+
+    def warm(self, sample_image=None):
+        """Create every instance up front and run one frame through each"""
+        if sample_image is None:
+            sample_image = np.zeros((240, 320, 3), dtype=np.uint8)
+        start = time.time()
+        warmed = []
+        try:
+            while True:
+                instance = self._create()
+                if instance is None:
+                    break
+                warmed.append(instance)
+                instance.process(sample_image)
+        except Exception as e:
+            logger.warning(f"{self.name} pool warm-up failed: {e}")
+        finally:
+            for instance in warmed:
+                self._idle.put(instance)
+        logger.info(f"{self.name} pool warmed: {len(warmed)} instances in {time.time() - start:.2f}s")
+        return len(warmed)
+
+    def process(self, image, timeout=30):
+        """Run image through a pooled instance and return its results"""
+        try:
+            instance = self._idle.get_nowait()
+        except queue.Empty:
+            instance = self._create()
+            if instance is None:
+                instance = self._idle.get(timeout=timeout)
+        try:
+            results = instance.process(image)
+        except Exception:
+            # Only a failure inside the graph retires it; callers' own errors never reach here
+            self._discard(instance)
+            raise
+        self._idle.put(instance)
+        return results
+
+class IVFIndex:
+    """Inverted-file approximate nearest neighbour index over gallery rows.
+
+    Rows are bucketed by their nearest k-means centroid; a query only scans the
+    buckets of its nprobe closest centroids. The index tracks row ids, so the
+    owning FaceGallery reports adds, removes and swap-moves to keep it in sync.
+    """
+
+    def __init__(self, dim=128, nlist=0, nprobe=8, min_train_size=1024, kmeans_iters=10, seed=0):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.kmeans_iters = kmeans_iters
+        self._rng = np.random.default_rng(seed)
+        self.centroids = None
+        self._centroid_sq_norms = None
+        self._lists = []
+        self._assignment = {}  # row -> (list id, position in list)
+        self.trained_size = 0
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def reset(self):
+        self.centroids = None
+        self._centroid_sq_norms = None
+        self._lists = []
+        self._assignment = {}
+        self.trained_size = 0
+
+    def untrained_copy(self):
+        """A fresh index with the same settings, for building off the gallery lock"""
+        return IVFIndex(self.dim, self.nlist, self.nprobe, self.min_train_size, self.kmeans_iters,
+                        seed=int(self._rng.integers(1 << 31)))
+
+    def needs_training(self, count):
+        if count < self.min_train_size:
+            return False
+        # Retrain once the gallery has grown 4x past the data the centroids saw
+        return not self.is_trained or count > 4 * self.trained_size
+
+    def _nearest_centroids(self, vectors, k=1):
+        scores = self._centroid_sq_norms - 2.0 * (vectors @ self.centroids.T)
+        if k == 1:
+            return np.argmin(scores, axis=1)
+        k = min(k, scores.shape[1])
+        return np.argpartition(scores, k - 1, axis=1)[:, :k]
+
+    def train(self, matrix):
+        """Fit coarse centroids with k-means on a sample, then bucket every row"""
+        count = len(matrix)
+        nlist = self.nlist or max(1, int(4 * np.sqrt(count)))
+        nlist = min(nlist, count)
+        sample_size = min(count, 64 * nlist)
+        sample = matrix[self._rng.choice(count, sample_size, replace=False)]
+        centroids = sample[self._rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.kmeans_iters):
+            sq_norms = np.einsum('ij,ij->i', centroids, centroids)
+            labels = np.argmin(sq_norms - 2.0 * (sample @ centroids.T), axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            sizes = np.bincount(labels, minlength=nlist)
+            empty = sizes == 0
+            centroids[~empty] = sums[~empty] / sizes[~empty, None]
+            if empty.any():
+                centroids[empty] = sample[self._rng.choice(sample_size, int(empty.sum()), replace=False)]
+
+        self.centroids = centroids.astype(np.float32)
+        self._centroid_sq_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        self._lists = [[] for _ in range(nlist)]
+        self._assignment = {}
+        for row, list_id in enumerate(self._nearest_centroids(matrix)):
+            self._append(row, int(list_id))
+        self.trained_size = count
+        logger.info(f"IVF index trained: {count} rows, {nlist} lists")
+
+    def _append(self, row, list_id):
+        bucket = self._lists[list_id]
+        self._assignment[row] = (list_id, len(bucket))
+        bucket.append(row)
+
+    def add(self, row, vector):
+        if not self.is_trained:
+            return
+        self.remove(row)
+        list_id = int(self._nearest_centroids(vector.reshape(1, -1))[0])
+        self._append(row, list_id)
+
+    def remove(self, row):
+        entry = self._assignment.pop(row, None)
+        if entry is None:
+            return
+        list_id, position = entry
+        bucket = self._lists[list_id]
+        last = bucket.pop()
+        if last != row:
+            bucket[position] = last
+            self._assignment[last] = (list_id, position)
+
+    def move(self, old_row, new_row):
+        """Re-key old_row as new_row after the gallery swapped it into a freed slot"""
+        entry = self._assignment.pop(old_row, None)
+        if entry is None:
+            return
+        list_id, position = entry
+        self._lists[list_id][position] = new_row
+        self._assignment[new_row] = entry
+
+    def candidates(self, query, nprobe=None):
+        """Row ids stored in the buckets closest to query"""
+        probes = self._nearest_centroids(query.reshape(1, -1), nprobe or self.nprobe)[0]
+        buckets = [self._lists[int(list_id)] for list_id in np.atleast_1d(probes)]
+        return np.fromiter((row for bucket in buckets for row in bucket), dtype=np.intp)
+
+class FaceGallery:
+    """In-memory gallery of enrolled encodings.
+
+    Encodings live in one preallocated float32 matrix that grows by doubling,
+    with cached squared row norms and a name -> row dict. Deletes swap the last
+    row into the freed slot so every mutation is O(1), and matching is a single
+    matrix-vector product over the live rows.
+
+    An attached IVF index is (re)trained on a background thread from a snapshot
+    of the rows; until the new index is swapped in, matches keep using the old
+    index, or the exact scan if there is none yet.
+    """
+
+    def __init__(self, dim=128, initial_capacity=64, index=None):
+        self.dim = dim
+        self.index = index
+        self._matrix = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._sq_norms = np.zeros(initial_capacity, dtype=np.float32)
+        self._names = []
+        self._rows = {}
+        self._lock = threading.RLock()
+        self._generation = 0  # bumped by load() so a stale background build is dropped
+        self._training = None  # thread building the next index, if any
+        self._dirty_rows = set()  # rows written since the training snapshot was taken
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    @property
+    def names(self):
+        with self._lock:
+            return list(self._names)
+
+    def snapshot(self):
+        """Return (names, encodings) copies of the live rows"""
+        with self._lock:
+            count = len(self._names)
+            return list(self._names), self._matrix[:count].copy()
+
+    def _grow(self, required):
+        capacity = self._matrix.shape[0]
+        if required <= capacity:
+            return
+        while capacity < required:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        sq_norms = np.zeros(capacity, dtype=np.float32)
+        count = len(self._names)
+        matrix[:count] = self._matrix[:count]
+        sq_norms[:count] = self._sq_norms[:count]
+        self._matrix = matrix
+        self._sq_norms = sq_norms
+
+    def load(self, names, encodings):
+        """Replace the gallery contents in one shot"""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            self._names = []
+            self._rows = {}
+            self._grow(len(encodings))
+            count = 0
+            for name, encoding in zip(names, encodings):
+                row = self._rows.get(name)
+                if row is None:
+                    row = count
+                    count += 1
+                    self._names.append(name)
+                    self._rows[name] = row
+                self._matrix[row] = encoding
+            self._sq_norms[:count] = np.einsum('ij,ij->i', self._matrix[:count], self._matrix[:count])
+            if self.index is not None:
+                self.index.reset()
+                self._generation += 1
+                self._training = None
+                self._maybe_train_index()
+
+    def _maybe_train_index(self):
+        """Start a background index build if the gallery needs one (caller holds the lock)"""
+        count = len(self._names)
+        if self.index is None or self._training is not None or not self.index.needs_training(count):
+            return
+        index = self.index.untrained_copy()
+        self._dirty_rows = set()
+        self._training = threading.Thread(
+            target=self._train_index,
+            args=(index, self._matrix[:count].copy(), self._generation),
+            name='ivf-train',
+            daemon=True
+        )
+        self._training.start()
+
+    def _train_index(self, index, snapshot, generation):
+        """Train index on snapshot off the lock, then catch it up with later writes and swap it in"""
+        try:
+            index.train(snapshot)
+        except Exception as e:
+            logger.error(f"IVF index training failed: {e}")
+            index = None
+        with self._lock:
+            if self._training is threading.current_thread():
+                self._training = None
+            if index is None or generation != self._generation:
+                return
+            count = len(self._names)
+            for row in range(count, len(snapshot)):
+                index.remove(row)
+            for row in self._dirty_rows:
+                if row < count:
+                    index.add(row, self._matrix[row])
+            self._dirty_rows = set()
+            self.index = index
+            self._maybe_train_index()
+
+    def wait_for_index(self, timeout=None):
+        """Block until any background index build has been swapped in"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                thread = self._training
+            if thread is None:
+                return True
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                return False
+
+    def upsert(self, name, encoding):
+        """Insert or overwrite the encoding stored for name"""
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            row = self._rows.get(name)
+            if row is None:
+                row = len(self._names)
+                self._grow(row + 1)
+                self._names.append(name)
+                self._rows[name] = row
+            self._matrix[row] = encoding
+            self._sq_norms[row] = encoding @ encoding
+            if self.index is not None:
+                self.index.add(row, encoding)
+                if self._training is not None:
+                    self._dirty_rows.add(row)
+                self._maybe_train_index()
+            return row
+
+    def remove(self, name):
+        """Swap-remove name from the gallery, returns False if it was not enrolled"""
+        with self._lock:
+            row = self._rows.pop(name, None)
+            if row is None:
+                return False
+            last = len(self._names) - 1
+            if self.index is not None:
+                self.index.remove(row)
+                self.index.move(last, row)
+                if self._training is not None:
+                    self._dirty_rows.add(row)
+            if row != last:
+                moved = self._names[last]
+                self._matrix[row] = self._matrix[last]
+                self._sq_norms[row] = self._sq_norms[last]
+                self._names[row] = moved
+                self._rows[moved] = row
+            self._names.pop()
+            return True
+
+    def match(self, encoding, exact=False, nprobe=None):
+        """Return (name, distance) of the closest enrolled face, or (None, inf) if empty.
+
+        Uses the ANN index when one is attached and trained, unless exact=True.
+        """
+        query = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            count = len(self._names)
+            if count == 0:
+                return None, float('inf')
+            if not exact and self.index is not None and self.index.is_trained:
+                rows = self.index.candidates(query, nprobe)
+                if len(rows) == 0:
+                    return None, float('inf')
+                best_pos, distance = nearest_row(self._matrix[rows], self._sq_norms[rows], query)
+                best = int(rows[best_pos])
+            else:
+                best, distance = nearest_row(self._matrix[:count], self._sq_norms[:count], query)
+            return self._names[best], distance
+
+    def match_many(self, encodings):
+        """Match a batch of encodings with one matrix product, returns [(name, distance), ...]"""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            count = len(self._names)
+            if count == 0 or len(queries) == 0:
+                return [(None, float('inf'))] * len(queries)
+            partial = self._sq_norms[:count][None, :] - 2.0 * (queries @ self._matrix[:count].T)
+            best = np.argmin(partial, axis=1)
+            best_partial = partial[np.arange(len(queries)), best]
+            distances = np.sqrt(np.maximum(best_partial + np.einsum('ij,ij->i', queries, queries), 0.0))
+            return [(self._names[int(row)], float(distance)) for row, distance in zip(best, distances)]
+
+class SharedGalleryView:
+    """Read-only gallery attached from a shared memory segment.
+
+    Segment layout: int64 header (count, dim, names_nbytes), float32 encodings
+    (count x dim), float32 squared norms (count), then the names as UTF-8 JSON.
+    """
+    HEADER = 3 * 8
+
+    def __init__(self, segment_name):
+        self.shm = shared_memory.SharedMemory(name=segment_name)
+        count, dim, names_nbytes = np.frombuffer(self.shm.buf, dtype=np.int64, count=3)
+        count, dim = int(count), int(dim)
+        offset = self.HEADER
+        self.matrix = np.frombuffer(self.shm.buf, dtype=np.float32, count=count * dim, offset=offset).reshape(count, dim)
+        offset += count * dim * 4
+        self.sq_norms = np.frombuffer(self.shm.buf, dtype=np.float32, count=count, offset=offset)
+        offset += count * 4
+        self.names = json.loads(bytes(self.shm.buf[offset:offset + int(names_nbytes)]).decode('utf-8'))
+
+    @staticmethod
+    def publish(segment_name, names, matrix):
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        count, dim = matrix.shape
+        names_bytes = json.dumps(names).encode('utf-8')
+        size = SharedGalleryView.HEADER + count * dim * 4 + count * 4 + len(names_bytes)
+        shm = shared_memory.SharedMemory(name=segment_name, create=True, size=max(size, 1))
+        np.frombuffer(shm.buf, dtype=np.int64, count=3)[:] = (count, dim, len(names_bytes))
+        offset = SharedGalleryView.HEADER
+        np.frombuffer(shm.buf, dtype=np.float32, count=count * dim, offset=offset)[:] = matrix.ravel()
+        offset += count * dim * 4
+        np.frombuffer(shm.buf, dtype=np.float32, count=count, offset=offset)[:] = np.einsum('ij,ij->i', matrix, matrix)
+        offset += count * 4
+        shm.buf[offset:offset + len(names_bytes)] = names_bytes
+        return shm
+
+    def match(self, encoding):
+        if len(self.names) == 0:
+            return None, float('inf')
+        query = np.asarray(encoding, dtype=np.float32).ravel()
+        best, distance = nearest_row(self.matrix, self.sq_norms, query)
+        return self.names[best], distance
+
+    def close(self):
+        # Drop the numpy views before releasing the mapping
+        self.matrix = self.sq_norms = None
+        self.shm.close()
+
+class ProcessInferenceBackend:
+    """Runs detection, liveness and encoding in a pool of spawned worker processes.
+
+    Workers keep their models loaded for their whole lifetime and match against
+    a gallery snapshot the parent republishes to shared memory on every change;
+    request threads only ship bytes and wait on futures.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_inference_worker_init
+        )
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._segments = []  # newest last; the previous one stays linked for in-flight tasks
+        
+    @property
+    def segment_name(self):
+        with self._lock:
+            return self._segments[-1].name if self._segments else None
+
+    def publish(self, names, matrix):
+        """Copy a gallery snapshot into a fresh shared memory segment"""
+        with self._lock:
+            self._generation += 1
+            segment = SharedGalleryView.publish(f"ecohome_gallery_{os.getpid()}_{self._generation}", names, matrix)
+            self._segments.append(segment)
+            while len(self._segments) > 2:
+                stale = self._segments.pop(0)
+                stale.close()
+                stale.unlink()
+        logger.info(f"Published gallery to shared memory: {len(names)} faces (generation {self._generation})")
+
+    def warm(self):
+        """Start every worker and wait for its models to load"""
+        start = time.time()
+        futures = [self.executor.submit(_worker_ping) for _ in range(self.workers)]
+        pids = {future.result() for future in futures}
+        logger.info(f"Inference process pool ready: {len(pids)} workers in {time.time() - start:.2f}s")
+
+    def recognize(self, data):
+        """(name, distance, message) for an encoded image, matched inside a worker"""
+        for _ in range(2):
+            try:
+                return self.executor.submit(_worker_recognize, data, self.segment_name).result()
+            except FileNotFoundError:
+                # Segment was retired while the task was queued; retry on the newest one
+                continue
+        return None, float('inf'), "Gallery snapshot unavailable"
+
+    def locate(self, data, signature_size=16):
+        """(box, appearance signature, message) of the largest face in an encoded image"""
+        return self.executor.submit(_worker_locate, data, signature_size).result()
+
+    def recognize_at(self, data, box):
+        """(name, distance, encoding, message) for a face box already located"""
+        for _ in range(2):
+            try:
+                return self.executor.submit(_worker_recognize_at, data, self.segment_name, box).result()
+            except FileNotFoundError:
+                continue
+        return None, float('inf'), None, "Gallery snapshot unavailable"
+
+    def encode(self, image):
+        return self.executor.submit(_worker_encode, image).result()
+
+    def analyze_enrollment_image(self, image):
+        return self.executor.submit(_worker_analyze_enrollment, image).result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+                segment.unlink()
+            self._segments = []
+
+# Per-worker state: the attached shared gallery view
+_worker_gallery = {"name": None, "view": None}
+
+def _inference_worker_init():
+    # face_recognition is imported lazily; load its models before the first task
+    face_recognition.face_locations(np.zeros((64, 64, 3), dtype=np.uint8))
+    face_system.face_mesh_pool.warm()
+
+def _worker_ping():
+    return os.getpid()
+
+def _worker_attach_gallery(segment_name):
+    if _worker_gallery["name"] != segment_name:
+        if _worker_gallery["view"] is not None:
+            _worker_gallery["view"].close()
+            _worker_gallery["name"] = _worker_gallery["view"] = None
+        _worker_gallery["view"] = SharedGalleryView(segment_name)
+        _worker_gallery["name"] = segment_name
+    return _worker_gallery["view"]
+
+def _worker_recognize(data, segment_name):
+    if segment_name is None:
+        return None, float('inf'), "No enrolled faces in database"
+    image = decode_image_bytes(data)
+    if image is None:
+        return None, float('inf'), "No valid image provided"
+    encoding, msg = face_system.extract_face_encoding(image)
+    if encoding is None:
+        return None, float('inf'), msg
+    name, distance = _worker_attach_gallery(segment_name).match(encoding)
+    return name, distance, "Success"
+
+def _worker_locate(data, signature_size):
+    image = decode_image_bytes(data)
+    if image is None:
+        return None, None, "No valid image provided"
+    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    box, msg = face_system.locate_face(rgb_image)
+    if box is None:
+        return None, None, msg
+    return box, FaceTracker.signature(rgb_image, box, signature_size), msg
+
+def _worker_recognize_at(data, segment_name, box):
+    if segment_name is None:
+        return None, float('inf'), None, "No enrolled faces in database"
+    image = decode_image_bytes(data)
+    if image is None:
+        return None, float('inf'), None, "No valid image provided"
+    encodings = face_recognition.face_encodings(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), [box])
+    if not encodings:
+        return None, float('inf'), None, "Could not extract face features"
+    name, distance = _worker_attach_gallery(segment_name).match(encodings[0])
+    return name, distance, encodings[0], "Success"
+
+def _worker_encode(image):
+    return face_system.extract_face_encoding(image)
+
+def _worker_analyze_enrollment(image):
+    return face_system.analyze_enrollment_image(image)
+
+class GalleryStore:
+    """Authoritative on-disk gallery: append-only memory-mapped .npy files.
+
+    <path>.npy holds float32 encodings and <path>_names.npy the UTF-8 names,
+    one slot per enrollment. Re-enrolling overwrites the name's slot in place,
+    deleting blanks its name (a tombstone), and new names are appended; every
+    change touches one slot plus the small <path>.json header, so writes are
+    O(1). Files grow by doubling and are compacted once tombstones pile up.
+    Startup maps the files instead of unpickling them.
+    """
+
+    NAME_BYTES = 128
+
+    def __init__(self, path, dim=128, initial_capacity=1024):
+        self.path = path
+        self.dim = dim
+        self.initial_capacity = initial_capacity
+        self.encodings_file = f"{path}.npy"
+        self.names_file = f"{path}_names.npy"
+        self.meta_file = f"{path}.json"
+        self._lock = threading.Lock()
+        self._encodings = None
+        self._names = None
+        self._slots = {}
+        self.used = 0
+        self.tombstones = 0
+
+    def exists(self):
+        return all(os.path.exists(f) for f in (self.encodings_file, self.names_file, self.meta_file))
+
+    def _create_files(self, suffix, capacity):
+        encodings = np.lib.format.open_memmap(
+            self.encodings_file + suffix, mode='w+', dtype=np.float32, shape=(capacity, self.dim))
+        names = np.lib.format.open_memmap(
+            self.names_file + suffix, mode='w+', dtype=f'S{self.NAME_BYTES}', shape=(capacity,))
+        return encodings, names
+
+    def _write_meta(self):
+        tmp = self.meta_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({"used": self.used, "tombstones": self.tombstones, "dim": self.dim}, f)
+        os.replace(tmp, self.meta_file)
+
+    def validate_name(self, name):
+        """Error message if name cannot be stored, else None"""
+        try:
+            self._encode_name(name)
+            return None
+        except ValueError as e:
+            return str(e)
+
+    def _encode_name(self, name):
+        raw = name.encode('utf-8')
+        if not raw or len(raw) > self.NAME_BYTES:
+            raise ValueError(f"Name must be 1-{self.NAME_BYTES} bytes of UTF-8")
+        return raw
+
+    def open(self):
+        """Map the gallery files, returns (names, encodings) of the live slots"""
+        with self._lock:
+            if not self.exists():
+                self._encodings, self._names = self._create_files('', self.initial_capacity)
+                self.used = self.tombstones = 0
+                self._slots = {}
+                self._write_meta()
+                return [], np.zeros((0, self.dim), dtype=np.float32)
+
+            with open(self.meta_file) as f:
+                meta = json.load(f)
+            self._encodings = np.load(self.encodings_file, mmap_mode='r+')
+            self._names = np.load(self.names_file, mmap_mode='r+')
+            self.used = int(meta["used"])
+            self.tombstones = int(meta.get("tombstones", 0))
+
+            raw_names = self._names[:self.used]
+            live = np.flatnonzero(raw_names != b'')
+            names = [raw.decode('utf-8') for raw in raw_names[live]]
+            self._slots = dict(zip(names, live.tolist()))
+            return names, np.asarray(self._encodings[live])
+
+    def _grow(self):
+        capacity = len(self._names) * 2
+        encodings, names = self._create_files('.grow', capacity)
+        encodings[:self.used] = self._encodings[:self.used]
+        names[:self.used] = self._names[:self.used]
+        encodings.flush()
+        names.flush()
+        del encodings, names
+        self._swap_in('.grow')
+        logger.info(f"Gallery store grown to {capacity} slots")
+
+    def _swap_in(self, suffix):
+        # Every mapping of the old files must be released before replacing them (Windows)
+        self._encodings = self._names = None
+        os.replace(self.encodings_file + suffix, self.encodings_file)
+        os.replace(self.names_file + suffix, self.names_file)
+        self._encodings = np.load(self.encodings_file, mmap_mode='r+')
+        self._names = np.load(self.names_file, mmap_mode='r+')
+
+    def put(self, name, encoding):
+        """Insert or overwrite one identity"""
+        raw = self._encode_name(name)
+        with self._lock:
+            slot = self._slots.get(name)
+            if slot is None:
+                if self.used == len(self._names):
+                    self._grow()
+                slot = self.used
+                self.used += 1
+            self._encodings[slot] = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+            self._names[slot] = raw
+            self._encodings.flush()
+            self._names.flush()
+            self._slots[name] = slot
+            self._write_meta()
+
+    def delete(self, name):
+        """Tombstone one identity, compacting when a quarter of the slots are dead"""
+        with self._lock:
+            slot = self._slots.pop(name, None)
+            if slot is None:
+                return False
+            self._names[slot] = b''
+            self._names.flush()
+            self.tombstones += 1
+            if self.tombstones >= 64 and self.tombstones * 4 >= self.used:
+                self._compact()
+            self._write_meta()
+            return True
+
+    def _compact(self):
+        live = np.flatnonzero(self._names[:self.used] != b'')
+        capacity = max(self.initial_capacity, len(self._names))
+        encodings, names = self._create_files('.compact', capacity)
+        encodings[:len(live)] = self._encodings[live]
+        names[:len(live)] = self._names[live]
+        encodings.flush()
+        names.flush()
+        del encodings, names
+        self._swap_in('.compact')
+        self.used, self.tombstones = len(live), 0
+        self._slots = {raw.decode('utf-8'): slot for slot, raw in enumerate(self._names[:self.used])}
+        logger.info(f"Gallery store compacted to {self.used} slots")
+
+    def import_all(self, names, encodings):
+        """Build the store from scratch in one go (legacy migration).
+
+        Entries whose name or encoding cannot be stored are skipped one at a
+        time and returned as (name, reason). The files are written under a
+        temporary suffix and swapped in only once complete, with the header
+        last, so a failed import leaves no store behind and the next start
+        retries it. The store is left closed; call open() afterwards.
+        """
+        entries, skipped = {}, []
+        for name, encoding in zip(names, encodings):
+            try:
+                if not isinstance(name, str):
+                    raise ValueError("Name must be a string")
+                self._encode_name(name)
+                entries[name] = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+            except ValueError as e:
+                skipped.append((name, str(e)))
+        
+        capacity = self.initial_capacity
+        while capacity < len(entries):
+            capacity *= 2
+        suffix = '.import'
+        try:
+            encodings_out, names_out = self._create_files(suffix, capacity)
+            for slot, (name, encoding) in enumerate(entries.items()):
+                encodings_out[slot] = encoding
+                names_out[slot] = name.encode('utf-8')
+            encodings_out.flush()
+            names_out.flush()
+            del encodings_out, names_out
+        except Exception:
+            for leftover in (self.encodings_file + suffix, self.names_file + suffix):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            raise
+        
+        with self._lock:
+            self._encodings = self._names = None
+            os.replace(self.encodings_file + suffix, self.encodings_file)
+            os.replace(self.names_file + suffix, self.names_file)
+            self.used, self.tombstones = len(entries), 0
+            self._write_meta()
+        return skipped
+
+class SQLiteConnectionManager:
+    """Pool of persistent SQLite connections shared by request and background threads.
+
+    The threaded Flask server runs each request on a fresh thread, so connections
+    are checked out of a bounded pool rather than pinned to threads. Every
+    connection runs in WAL mode with synchronous=NORMAL, a sized page cache and
+    mmap, and keeps its compiled statements cached for reuse (callers pass the
+    same SQL text). Time spent waiting for a pooled connection or for the
+    SQLite write lock is recorded in metrics.
+    """
+
+    def __init__(self, db_path, pool_size=8, cache_size_kb=16384, mmap_size=256 * 1024 * 1024,
+                 busy_timeout_ms=5000, statement_cache_size=128):
+        self.db_path = db_path
+        self.pool_size = max(1, pool_size)
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.statement_cache_size = statement_cache_size
+        self._idle = queue.LifoQueue(maxsize=self.pool_size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self.metrics = {
+            "connections_opened": 0,
+            "checkouts": 0,
+            "pool_waits": 0,
+            "pool_wait_seconds": 0.0,
+            "lock_waits": 0,
+            "lock_wait_seconds": 0.0,
+            "max_lock_wait_seconds": 0.0,
+            "busy_errors": 0
+        }
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000.0,
+            isolation_level=None,  # explicit transactions via transaction()
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        with self._lock:
+            self.metrics["connections_opened"] += 1
+        return conn
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.pool_size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        start = time.time()
+        conn = self._idle.get()
+        with self._lock:
+            self.metrics["pool_waits"] += 1
+            self.metrics["pool_wait_seconds"] += time.time() - start
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Check out a pooled connection (autocommit; use transaction() for writes)"""
+        conn = self._checkout()
+        with self._lock:
+            self.metrics["checkouts"] += 1
+        broken = False
+        try:
+            yield conn
+        except sqlite3.OperationalError as e:
+            if 'locked' in str(e) or 'busy' in str(e):
+                with self._lock:
+                    self.metrics["busy_errors"] += 1
+            raise
+        except sqlite3.ProgrammingError:
+            broken = True
+            raise
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if broken:
+                with self._lock:
+                    self._created -= 1
+                conn.close()
+            else:
+                self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction: BEGIN IMMEDIATE (timed as lock wait), commit or roll back"""
+        with self.connection() as conn:
+            start = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            waited = time.time() - start
+            if waited > 0.001:
+                with self._lock:
+                    self.metrics["lock_waits"] += 1
+                    self.metrics["lock_wait_seconds"] += waited
+                    self.metrics["max_lock_wait_seconds"] = max(self.metrics["max_lock_wait_seconds"], waited)
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.metrics, pool_size=self.pool_size, idle=self._idle.qsize())
+
+class LogWriter:
+    """Write-behind sink for recognition_logs and domain_logs.
+
+    Request threads only enqueue rows; a background thread drains the bounded
+    queue and writes each batch with executemany in a single transaction.
+    Rows arriving while the queue is full are dropped and counted.
+    """
+
+    TABLES = {
+        'recognition': "INSERT INTO recognition_logs (name, confidence, domain_used, timestamp) VALUES (?, ?, ?, ?)",
+        'domain': "INSERT INTO domain_logs (domain, endpoint, status, response_time, timestamp) VALUES (?, ?, ?, ?, ?)"
+    }
+
+    def __init__(self, db, max_queue=10000, batch_size=500, flush_interval=1.0):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._lock = threading.Lock()  # guards dropped, bumped from every request thread
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _timestamp():
+        # Same format and clock (UTC) as SQLite CURRENT_TIMESTAMP
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+
+    def _enqueue(self, table, row):
+        try:
+            self._queue.put_nowait((table, row))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if dropped % 1000 == 1:
+                logger.warning(f"Log queue full, dropped {dropped} entries so far")
+
+    def log_recognition(self, name, confidence, domain_used):
+        self._enqueue('recognition', (name, float(confidence), domain_used, self._timestamp()))
+
+    def log_domain_access(self, domain, endpoint, status, response_time):
+        self._enqueue('domain', (domain, endpoint, status, float(response_time), self._timestamp()))
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _write(self, batch):
+        rows = {}
+        for table, row in batch:
+            rows.setdefault(table, []).append(row)
+        try:
+            with timed_stage('db_write'), self.db.transaction() as conn:
+                for table, table_rows in rows.items():
+                    conn.executemany(self.TABLES[table], table_rows)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            with self._lock:
+                self.dropped += len(batch)
+            logger.error(f"Log batch write error ({len(batch)} rows lost): {e}")
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = []
+            deadline = time.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    if self._stop.is_set():
+                        # Shutting down: drain without waiting
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+
+    def stop(self, timeout=10):
+        """Flush everything still queued and stop the writer thread"""
+        self._stop.set()
+        self._thread.join(timeout)
+
+class RollingStats:
+    """In-process rolling window of domain access and recognition metrics.
+
+    Events land in per-minute ring-buffer slots keyed by (domain, endpoint,
+    status) and by recognition domain, and are also added to running totals.
+    Minutes that fall out of the window are subtracted again, so both recording
+    and answering /domain/stats are O(1) in the number of events.
+    """
+
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+    def __init__(self, window_minutes=1440):
+        self.window = window_minutes
+        self._slots = [None] * window_minutes  # (minute, domain_map, recognition_map)
+        self._domain_totals = {}
+        self._recognition_totals = {}
+        self._oldest = None
+        self._lock = threading.Lock()
+
+    def _bucket(self, response_time):
+        for i, upper in enumerate(self.LATENCY_BUCKETS):
+            if response_time <= upper:
+                return i
+        return len(self.LATENCY_BUCKETS) - 1
+
+    @staticmethod
+    def _subtract(totals, entries):
+        for key, values in entries.items():
+            total = totals[key]
+            total[0] -= values[0]
+            total[1] -= values[1]
+            if len(values) > 2:
+                for i, count in enumerate(values[2]):
+                    total[2][i] -= count
+            if total[0] <= 0:
+                del totals[key]
+
+    def _expire(self, now_minute):
+        cutoff = now_minute - self.window
+        if self._oldest is None:
+            self._oldest = now_minute
+        if cutoff - self._oldest >= self.window:
+            # Idle for longer than the whole window: everything is stale
+            self._slots = [None] * self.window
+            self._domain_totals = {}
+            self._recognition_totals = {}
+            self._oldest = cutoff + 1
+        while self._oldest <= cutoff:
+            index = self._oldest % self.window
+            slot = self._slots[index]
+            if slot is not None and slot[0] == self._oldest:
+                self._subtract(self._domain_totals, slot[1])
+                self._subtract(self._recognition_totals, slot[2])
+                self._slots[index] = None
+            self._oldest += 1
+
+    def _slot(self, minute):
+        # Backfilled minutes may predate the first live event
+        self._oldest = min(self._oldest, minute)
+        index = minute % self.window
+        slot = self._slots[index]
+        if slot is None or slot[0] != minute:
+            slot = self._slots[index] = (minute, {}, {})
+        return slot
+
+    def record_domain(self, domain, endpoint, status, response_time, timestamp=None):
+        now = time.time()
+        minute = int((timestamp or now) // 60)
+        key = (domain, endpoint, status)
+        bucket = self._bucket(response_time)
+        with self._lock:
+            self._expire(int(now // 60))
+            if minute <= int(now // 60) - self.window:
+                return
+            for entries in (self._slot(minute)[1], self._domain_totals):
+                values = entries.get(key)
+                if values is None:
+                    values = entries[key] = [0, 0.0, [0] * len(self.LATENCY_BUCKETS)]
+                values[0] += 1
+                values[1] += response_time
+                values[2][bucket] += 1
+
+    def record_recognition(self, domain_used, confidence, timestamp=None):
+        now = time.time()
+        minute = int((timestamp or now) // 60)
+        key = domain_used or "unknown"
+        with self._lock:
+            self._expire(int(now // 60))
+            if minute <= int(now // 60) - self.window:
+                return
+            for entries in (self._slot(minute)[2], self._recognition_totals):
+                values = entries.get(key)
+                if values is None:
+                    values = entries[key] = [0, 0.0]
+                values[0] += 1
+                values[1] += confidence
+
+    def snapshot(self):
+        """(domain_access_stats, recognition_stats) over the window, shaped like /domain/stats"""
+        with self._lock:
+            self._expire(int(time.time() // 60))
+            domain_stats = [
+                {
+                    "domain": domain,
+                    "endpoint": endpoint,
+                    "status": status,
+                    "count": values[0],
+                    "avg_response_time": values[1] / values[0],
+                    "latency_histogram": {
+                        ("+Inf" if upper == float('inf') else str(upper)): count
+                        for upper, count in zip(self.LATENCY_BUCKETS, values[2])
+                    }
+                } for (domain, endpoint, status), values in self._domain_totals.items()
+            ]
+            recognition_stats = [
+                {
+                    "domain_used": domain_used,
+                    "count": values[0],
+                    "avg_confidence": values[1] / values[0]
+                } for domain_used, values in self._recognition_totals.items()
+            ]
+        domain_stats.sort(key=lambda stat: stat["count"], reverse=True)
+        return domain_stats, recognition_stats
+
+    def backfill(self, db, until=None):
+        """Replay the last window of logged rows from SQLite (startup only)
+
+        until (a UTC 'YYYY-MM-DD HH:MM:SS' string) excludes rows already
+        recorded live when the backfill runs in the background.
+        """
+        start = time.time()
+        since = f"-{self.window} minutes"
+        until = until or '9999-12-31 23:59:59'
+        rows = 0
+        with db.connection() as conn:
+            for timestamp, domain, endpoint, status, response_time in conn.execute(
+                "SELECT CAST(strftime('%s', timestamp) AS INTEGER), domain, endpoint, status, response_time "
+                "FROM domain_logs WHERE timestamp > datetime('now', ?) AND timestamp < ?", (since, until)
+            ):
+                self.record_domain(domain, endpoint, status, response_time or 0.0, timestamp)
+                rows += 1
+            for timestamp, domain_used, confidence in conn.execute(
+                "SELECT CAST(strftime('%s', timestamp) AS INTEGER), domain_used, confidence "
+                "FROM recognition_logs WHERE timestamp > datetime('now', ?) AND timestamp < ?", (since, until)
+            ):
+                self.record_recognition(domain_used, confidence or 0.0, timestamp)
+                rows += 1
+        logger.info(f"Rolling stats backfilled from {rows} log rows in {(time.time() - start) * 1000:.0f} ms")
+
+class LogRetention:
+    """Rolls log rows older than the retention window into daily summary tables.
+
+    Runs on a background thread every interval; each day is rolled up and
+    deleted in its own short transaction so writers are never blocked for long.
+    Summary rows older than summary_days are pruned as well.
+    """
+
+    def __init__(self, db, retention_days=30, summary_days=365, interval_hours=6.0):
+        self.db = db
+        self.retention_days = retention_days
+        self.summary_days = summary_days
+        self.interval = interval_hours * 3600
+        self.last_run = None
+        self.rows_rolled_up = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='log-retention', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Log retention error: {e}")
+            self._stop.wait(self.interval)
+
+    def run_once(self):
+        with self.db.connection() as conn:
+            cutoff = conn.execute("SELECT date('now', ?)", (f"-{int(self.retention_days)} days",)).fetchone()[0]
+            oldest = conn.execute("""
+                SELECT MIN(day) FROM (
+                    SELECT date(MIN(timestamp)) AS day FROM recognition_logs
+                    UNION ALL
+                    SELECT date(MIN(timestamp)) AS day FROM domain_logs
+                )
+            """).fetchone()[0]
+            
+        rolled = 0
+        day = oldest
+        while day is not None and day < cutoff:
+            with self.db.transaction() as conn:
+                rolled += self._roll_up_day(conn, day)
+                day = conn.execute("SELECT date(?, '+1 day')", (day,)).fetchone()[0]
+        
+        with self.db.transaction() as conn:
+            summary_cutoff = conn.execute("SELECT date('now', ?)", (f"-{int(self.summary_days)} days",)).fetchone()[0]
+            conn.execute("DELETE FROM recognition_daily WHERE day < ?", (summary_cutoff,))
+            conn.execute("DELETE FROM domain_daily WHERE day < ?", (summary_cutoff,))
+        
+        self.rows_rolled_up += rolled
+        self.last_run = datetime.now().isoformat()
+        if rolled:
+            logger.info(f"Log retention: rolled {rolled} rows older than {cutoff} into daily summaries")
+
+    @staticmethod
+    def _roll_up_day(conn, day):
+        start, end = f"{day} 00:00:00", conn.execute("SELECT datetime(?, '+1 day')", (f"{day} 00:00:00",)).fetchone()[0]
+        conn.execute("""
+            INSERT INTO recognition_daily (day, domain_used, name, count, confidence_sum)
+            SELECT ?, COALESCE(domain_used, 'unknown'), COALESCE(name, 'Unknown'), COUNT(*), COALESCE(SUM(confidence), 0)
+            FROM recognition_logs WHERE timestamp >= ? AND timestamp < ?
+            GROUP BY 2, 3
+            ON CONFLICT (day, domain_used, name) DO UPDATE SET
+                count = count + excluded.count,
+                confidence_sum = confidence_sum + excluded.confidence_sum
+        """, (day, start, end))
+        conn.execute("""
+            INSERT INTO domain_daily (day, domain, endpoint, status, count, response_time_sum)
+            SELECT ?, COALESCE(domain, 'unknown'), COALESCE(endpoint, ''), COALESCE(status, ''), COUNT(*), COALESCE(SUM(response_time), 0)
+            FROM domain_logs WHERE timestamp >= ? AND timestamp < ?
+            GROUP BY 2, 3, 4
+            ON CONFLICT (day, domain, endpoint, status) DO UPDATE SET
+                count = count + excluded.count,
+                response_time_sum = response_time_sum + excluded.response_time_sum
+        """, (day, start, end))
+        rolled = conn.execute("DELETE FROM recognition_logs WHERE timestamp >= ? AND timestamp < ?", (start, end)).rowcount
+        rolled += conn.execute("DELETE FROM domain_logs WHERE timestamp >= ? AND timestamp < ?", (start, end)).rowcount
+        return rolled
+
+    def stop(self):
+        self._stop.set()
+
+class ESP32CameraClient:
+    """Keep-alive HTTP client for one ESP32-CAM.
+
+    One pooled session per camera reuses TCP connections across captures and
+    status probes, with separate connect/read timeouts and retry backoff on
+    connection errors and gateway failures.
+    """
+
+    def __init__(self, base_url, connect_timeout=3.0, read_timeout=10.0, retries=2, backoff=0.2, pool_size=4):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, path, timeout=None, **kwargs):
+        with timed_stage('upstream_fetch'):
+            return self.session.get(f"{self.base_url}{path}", timeout=timeout or self.timeout, **kwargs)
+
+    def head(self, path, timeout=None, **kwargs):
+        with timed_stage('upstream_fetch'):
+            return self.session.head(f"{self.base_url}{path}", timeout=timeout or self.timeout, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+_camera_clients = {}
+_camera_clients_lock = threading.Lock()
+
+def get_camera_client(host):
+    """Shared ESP32CameraClient for host, created on first use"""
+    with _camera_clients_lock:
+        client = _camera_clients.get(host)
+        if client is None:
+            client = _camera_clients[host] = ESP32CameraClient(
+                f"http://{host}",
+                connect_timeout=float(os.getenv('ESP32_CONNECT_TIMEOUT', '3')),
+                read_timeout=float(os.getenv('ESP32_READ_TIMEOUT', '10')),
+                retries=int(os.getenv('ESP32_RETRIES', '2')),
+                backoff=float(os.getenv('ESP32_RETRY_BACKOFF', '0.2')),
+                pool_size=int(os.getenv('ESP32_POOL_SIZE', '4'))
+            )
+        return client
+
+CAPTURE_CHUNK_SIZE = int(os.getenv('CAPTURE_CHUNK_SIZE', '16384'))
+
+class CaptureFetch:
+    """One upstream capture shared by the caller that started it and any waiters"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.done = threading.Event()
+        self.frame = None
+        self.fetched_at = None
+        self.error = None
+
+class CaptureCoalescer:
+    """Single-flight upstream captures with a short-lived frame cache.
+
+    The first caller becomes the leader and streams the frame from the camera;
+    callers arriving while that fetch is in flight wait for it instead of
+    opening their own connection, and the finished frame is served to everyone
+    for ttl seconds afterwards.
+    """
+
+    def __init__(self, ttl=0.3, wait_timeout=10.0):
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._cached = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_errors = 0
+
+    def acquire(self):
+        """Returns ("hit", frame, fetched_at), ("follow", fetch, None) or ("lead", fetch, None)"""
+        now = time.time()
+        with self._lock:
+            if self._cached is not None and now - self._cached[1] <= self.ttl:
+                self.hits += 1
+                return "hit", self._cached[0], self._cached[1]
+            inflight = self._inflight
+            # A leader whose response was never consumed must not block everyone forever
+            if inflight is not None and now - inflight.started_at <= self.wait_timeout:
+                self.coalesced += 1
+                return "follow", inflight, None
+            self.misses += 1
+            fetch = self._inflight = CaptureFetch()
+            return "lead", fetch, None
+
+    def complete(self, fetch, frame):
+        with self._lock:
+            fetch.frame = frame
+            fetch.fetched_at = time.time()
+            if self.ttl > 0:
+                self._cached = (frame, fetch.fetched_at)
+            if self._inflight is fetch:
+                self._inflight = None
+        fetch.done.set()
+
+    def fail(self, fetch, error):
+        with self._lock:
+            if fetch.done.is_set():
+                return
+            fetch.error = error
+            self.upstream_errors += 1
+            if self._inflight is fetch:
+                self._inflight = None
+        fetch.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ttl_ms": int(self.ttl * 1000),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "upstream_errors": self.upstream_errors,
+                "in_flight": self._inflight is not None
+            }
+
+_capture_coalescers = {}
+
+def get_capture_coalescer(host):
+    """Shared CaptureCoalescer for host, created on first use"""
+    with _camera_clients_lock:
+        coalescer = _capture_coalescers.get(host)
+        if coalescer is None:
+            coalescer = _capture_coalescers[host] = CaptureCoalescer(
+                ttl=float(os.getenv('CAPTURE_CACHE_TTL_MS', '300')) / 1000.0,
+                wait_timeout=float(os.getenv('ESP32_READ_TIMEOUT', '10'))
+            )
+        return coalescer
+
+class StreamRecognizer:
+    """Continuous recognition from the ESP32-CAM MJPEG stream.
+
+    A reader thread splits the multipart stream into JPEG frames on the SOI/EOI
+    markers and keeps only the newest one; a recognition thread picks up the
+    latest frame, so frames arriving during inference are skipped, and then
+    waits long enough to keep inference under duty_cycle of the wall clock.
+    Results are fanned out to Server-Sent Events subscribers.
+    """
+
+    SOI = b'\xff\xd8'
+    EOI = b'\xff\xd9'
+    MAX_BUFFER = 4 * 1024 * 1024
+
+    def __init__(self, system, min_interval=0.2, duty_cycle=0.5):
+        self.system = system
+        self.min_interval = min_interval
+        self.duty_cycle = max(0.05, min(duty_cycle, 1.0))
+        self._running = threading.Event()
+        self._frame_ready = threading.Condition()
+        self._latest = None  # (seq, jpeg bytes)
+        self._subscribers = []
+        self._subscribers_lock = threading.Lock()
+        self._threads = []
+        self.frames_received = 0
+        self.frames_processed = 0
+        self.last_latency = 0.0
+        self.last_result = None
+        self.connected = False
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def stream_url(self):
+        return os.getenv('ESP32_STREAM_URL') or f"http://{self.system.esp32_local_ip}/stream"
+
+    def start(self):
+        if self._running.is_set():
+            return
+        self._running.set()
+        self._threads = [
+            threading.Thread(target=self._read_loop, name='stream-reader', daemon=True),
+            threading.Thread(target=self._recognize_loop, name='stream-recognizer', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Stream recognition started: {self.stream_url()}")
+
+    def stop(self):
+        self._running.clear()
+        with self._frame_ready:
+            self._frame_ready.notify_all()
+        logger.info("Stream recognition stopped")
+
+    def _read_loop(self):
+        backoff = 1.0
+        while self._running.is_set():
+            start = time.time()
+            try:
+                client = get_camera_client(self.system.esp32_local_ip)
+                with client.session.get(self.stream_url(), stream=True, timeout=client.timeout) as response:
+                    if response.status_code != 200:
+                        raise requests.exceptions.HTTPError(f"stream returned {response.status_code}")
+                    self.connected = True
+                    backoff = 1.0
+                    self.system.log_domain_access("stream_domain", "/stream", "connected", time.time() - start)
+                    self._split_frames(response.iter_content(chunk_size=CAPTURE_CHUNK_SIZE))
+            except Exception as e:
+                if self._running.is_set():
+                    logger.warning(f"Stream reader error: {e}; reconnecting in {backoff:.0f}s")
+                    self.system.log_domain_access("stream_domain", "/stream", "error", time.time() - start)
+            finally:
+                self.connected = False
+            if self._running.is_set():
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _split_frames(self, chunks):
+        buffer = bytearray()
+        for chunk in chunks:
+            if not self._running.is_set():
+                return
+            buffer += chunk
+            while True:
+                start = buffer.find(self.SOI)
+                if start < 0:
+                    # Keep a trailing 0xFF in case the marker is split across chunks
+                    del buffer[:max(0, len(buffer) - 1)]
+                    break
+                end = buffer.find(self.EOI, start + 2)
+                if end < 0:
+                    if start:
+                        del buffer[:start]
+                    if len(buffer) > self.MAX_BUFFER:
+                        buffer.clear()
+                    break
+                self._publish_frame(bytes(buffer[start:end + 2]))
+                del buffer[:end + 2]
+
+    def _publish_frame(self, frame):
+        with self._frame_ready:
+            self.frames_received += 1
+            self._latest = (self.frames_received, frame)
+            self._frame_ready.notify()
+
+    def _recognize_loop(self):
+        last_seq = 0
+        while self._running.is_set():
+            with self._frame_ready:
+                while self._running.is_set() and (self._latest is None or self._latest[0] == last_seq):
+                    self._frame_ready.wait(1.0)
+                if not self._running.is_set():
+                    return
+                seq, frame = self._latest
+            
+            skipped = seq - last_seq - 1 if last_seq else 0
+            last_seq = seq
+            start = time.time()
+            try:
+                name, confidence, message, success = self.system.recognize_image_bytes(
+                    frame, "stream_domain", camera_id=self.stream_url())
+            except Exception as e:
+                name, confidence, message, success = None, 0.0, f"Recognition failed: {str(e)}", False
+            self.last_latency = time.time() - start
+            self.frames_processed += 1
+            
+            self.last_result = {
+                "success": success,
+                "name": name if name else "Unknown",
+                "confidence": float(confidence) if confidence else 0.0,
+                "message": message,
+                "frame_seq": seq,
+                "frames_skipped": skipped,
+                "latency_ms": round(self.last_latency * 1000, 1),
+                "timestamp": datetime.now().isoformat()
+            }
+            self._broadcast(self.last_result)
+            
+            # Adapt the schedule to inference cost: spend at most duty_cycle of the time recognizing
+            time.sleep(max(self.min_interval, self.last_latency / self.duty_cycle - self.last_latency))
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=32)
+        with self._subscribers_lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._subscribers_lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def _broadcast(self, result):
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(result)
+            except queue.Full:
+                pass  # slow client; it will catch up with the next result
+
+    def status(self):
+        with self._subscribers_lock:
+            subscribers = len(self._subscribers)
+        return {
+            "running": self.running,
+            "connected": self.connected,
+            "stream_url": self.stream_url(),
+            "frames_received": self.frames_received,
+            "frames_processed": self.frames_processed,
+            "last_latency_ms": round(self.last_latency * 1000, 1),
+            "subscribers": subscribers,
+            "last_result": self.last_result
+        }
+
+class RecognitionCache:
+    """LRU cache of gallery matches keyed by camera and face appearance.
+
+    A lookup returns any unexpired (name, distance) stored for the same camera
+    whose face hash is within radius bits of the query. The hash is the
+    horizontal gradient signs of the FaceTracker signature thumbnail of the
+    detected face box, so only a near-identical face crop from the same camera
+    hits; a different person in front of the same background does not.
+    Cleared whenever the gallery changes.
+    """
+
+    def __init__(self, max_entries=256, ttl=5.0, radius=6):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.radius = radius
+        self._entries = OrderedDict()  # (camera id, face hash) -> (stored_at, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def face_hash(signature):
+        """Difference hash of a square signature thumbnail"""
+        size = int(round(np.sqrt(signature.size)))
+        thumb = signature.reshape(size, size)
+        bits = np.packbits((thumb[:, 1:] > thumb[:, :-1]).ravel())
+        return int.from_bytes(bits.tobytes(), 'big')
+
+    def get(self, camera_id, signature):
+        face_hash = self.face_hash(signature)
+        now = time.time()
+        with self._lock:
+            found = None
+            for stored_key in reversed(self._entries):
+                stored_at, result = self._entries[stored_key]
+                if now - stored_at > self.ttl or stored_key[0] != camera_id:
+                    continue
+                if bin(stored_key[1] ^ face_hash).count('1') <= self.radius:
+                    found = stored_key
+                    break
+            # Entries are in insertion/use order, so expired ones sit at the front
+            while self._entries:
+                oldest = next(iter(self._entries))
+                if now - self._entries[oldest][0] <= self.ttl:
+                    break
+                del self._entries[oldest]
+            if found is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(found)
+            self.hits += 1
+            return self._entries[found][1]
+
+    def put(self, camera_id, signature, result):
+        key = (camera_id, self.face_hash(signature))
+        with self._lock:
+            self._entries[key] = (time.time(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+class FrameRejection:
+    """Why the frame gate turned a frame away: stage, reason code and measured value"""
+
+    def __init__(self, stage, reason, value, message):
+        self.stage = stage
+        self.reason = reason
+        self.value = value
+        self.message = message
+
+class FrameGate:
+    """Cascade of cheap checks run before HOG detection and encoding.
+
+    Stages run in order on a copy downscaled to width pixels: mean brightness,
+    Laplacian sharpness, then the MediaPipe short-range face detector. The
+    first failing stage rejects the frame; counts are kept per stage and reason.
+    A detector error lets the frame through rather than rejecting it.
+    """
+
+    STAGES = ('brightness', 'blur', 'face_detector')
+
+    def __init__(self, detector_pool, stages=STAGES, min_brightness=20.0, max_brightness=240.0,
+                 min_sharpness=10.0, min_face_score=0.5, width=320):
+        self.detector_pool = detector_pool
+        self.stages = tuple(stage for stage in stages if stage in self.STAGES)
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.min_sharpness = min_sharpness
+        self.min_face_score = min_face_score
+        self.width = width
+        self._lock = threading.Lock()
+        self.counts = {"passed": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def _reject(self, stage, reason, value, message):
+        self._count(f"{stage}:{reason}")
+        return FrameRejection(stage, reason, value, message)
+
+    def check(self, image):
+        """None if the frame should go on to detection, else a FrameRejection"""
+        height, width = image.shape[:2]
+        if width > self.width:
+            scale = self.width / float(width)
+            image = cv2.resize(image, (self.width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        
+        with timed_stage('gate_quality'):
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            if 'brightness' in self.stages:
+                brightness = float(gray.mean())
+                if brightness < self.min_brightness:
+                    return self._reject('brightness', 'too_dark', brightness, f"Frame too dark (brightness {brightness:.1f})")
+                if brightness > self.max_brightness:
+                    return self._reject('brightness', 'too_bright', brightness, f"Frame too bright (brightness {brightness:.1f})")
+            if 'blur' in self.stages:
+                sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+                if sharpness < self.min_sharpness:
+                    return self._reject('blur', 'too_blurry', sharpness, f"Frame too blurry (sharpness {sharpness:.1f})")
+        
+        if 'face_detector' in self.stages:
+            try:
+                with timed_stage('gate_face_detector'):
+                    results = self.detector_pool.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+                score = max((detection.score[0] for detection in results.detections or []), default=0.0)
+                if score < self.min_face_score:
+                    return self._reject('face_detector', 'no_face', score, "No face found in image")
+            except Exception as e:
+                logger.warning(f"Frame gate face detector error, passing frame: {e}")
+        
+        self._count("passed")
+        return None
+
+    def check_bytes(self, data):
+        """check() on a reduced-scale decode of an encoded image (None if undecodable)"""
+        flags = cv2.IMREAD_REDUCED_COLOR_2
+        dimensions = jpeg_dimensions(data) if sniff_image_format(data) == 'jpeg' else None
+        if dimensions is not None and dimensions[0] >= self.width * 4:
+            flags = cv2.IMREAD_REDUCED_COLOR_4
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), flags)
+        if image is None:
+            return None
+        return self.check(image)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+class FaceTrack:
+    """One face followed across frames of a camera, with its cached identity"""
+
+    def __init__(self, box, name, distance, encoding, signature, now):
+        self.box = box
+        self.anchor_box = box  # box at the time the identity was computed
+        self.signature = signature  # appearance at the time the identity was computed
+        self.name = name
+        self.distance = distance
+        self.encoding = encoding
+        self.identified_at = now
+        self.last_seen = now
+        self.hits = 0
+
+class FaceTracker:
+    """Per-camera IoU association of face boxes so identities are reused across frames.
+
+    A detected box that overlaps a live track (IoU >= iou_threshold) reuses the
+    track's identity. The face is re-identified when no track matches, when the
+    identity is older than max_age seconds, or when the face no longer looks
+    like the one that was identified: the box drifted (IoU with the anchor box
+    below drift_iou), its area changed by more than max_scale_change, or its
+    appearance signature correlates below min_similarity with the anchor's.
+    The appearance check is what stops a different person stepping into the
+    same spot from inheriting the previous identity. Tracks not seen for
+    max_idle seconds are dropped.
+    """
+
+    def __init__(self, iou_threshold=0.3, drift_iou=0.5, max_idle=1.5, max_age=5.0,
+                 max_scale_change=0.25, min_similarity=0.9, signature_size=16):
+        self.iou_threshold = iou_threshold
+        self.drift_iou = drift_iou
+        self.max_idle = max_idle
+        self.max_age = max_age
+        self.max_scale_change = max_scale_change
+        self.min_similarity = min_similarity
+        self.signature_size = signature_size
+        self._tracks = {}  # camera_id -> [FaceTrack]
+        self._lock = threading.Lock()
+        self.counts = {"hit": 0, "new": 0, "drift": 0, "resized": 0, "appearance": 0, "expired": 0}
+
+    @staticmethod
+    def signature(image, box, size=16):
+        """Unit-norm, mean-removed size x size grayscale thumbnail of a face box (RGB or gray image)"""
+        top, right, bottom, left = box
+        crop = image[top:bottom, left:right]
+        if crop.size == 0:
+            return None
+        if crop.ndim == 3:
+            crop = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
+        thumb = cv2.resize(crop, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+        thumb -= thumb.mean()
+        norm = np.linalg.norm(thumb)
+        return thumb / norm if norm > 0 else None
+
+    @staticmethod
+    def iou(a, b):
+        """Intersection over union of two (top, right, bottom, left) boxes"""
+        top, right = max(a[0], b[0]), min(a[1], b[1])
+        bottom, left = min(a[2], b[2]), max(a[3], b[3])
+        inter = max(0, right - left) * max(0, bottom - top)
+        if inter == 0:
+            return 0.0
+        area_a = (a[1] - a[3]) * (a[2] - a[0])
+        area_b = (b[1] - b[3]) * (b[2] - b[0])
+        return inter / float(area_a + area_b - inter)
+
+    def _prune(self, now):
+        for camera_id in list(self._tracks):
+            tracks = [t for t in self._tracks[camera_id] if now - t.last_seen <= self.max_idle]
+            if tracks:
+                self._tracks[camera_id] = tracks
+            else:
+                del self._tracks[camera_id]
+
+    def _associate(self, camera_id, box):
+        best, best_iou = None, self.iou_threshold
+        for track in self._tracks.get(camera_id, []):
+            overlap = self.iou(track.box, box)
+            if overlap >= best_iou:
+                best, best_iou = track, overlap
+        return best
+
+    def lookup(self, camera_id, box, signature):
+        """The track whose cached identity can be reused for box, or None to re-identify"""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            track = self._associate(camera_id, box)
+            if track is None:
+                self.counts["new"] += 1
+                return None
+            track.box = box
+            track.last_seen = now
+            if now - track.identified_at > self.max_age:
+                self.counts["expired"] += 1
+                return None
+            if self.iou(track.anchor_box, box) < self.drift_iou:
+                self.counts["drift"] += 1
+                return None
+            anchor_area = (track.anchor_box[1] - track.anchor_box[3]) * (track.anchor_box[2] - track.anchor_box[0])
+            area = (box[1] - box[3]) * (box[2] - box[0])
+            if anchor_area <= 0 or abs(area / float(anchor_area) - 1.0) > self.max_scale_change:
+                self.counts["resized"] += 1
+                return None
+            if signature is None or track.signature is None or float(signature @ track.signature) < self.min_similarity:
+                self.counts["appearance"] += 1
+                return None
+            track.hits += 1
+            self.counts["hit"] += 1
+            return track
+
+    def update(self, camera_id, box, name, distance, encoding, signature):
+        """Store a fresh identity for box, refreshing its track or starting a new one"""
+        now = time.time()
+        with self._lock:
+            track = self._associate(camera_id, box)
+            if track is None:
+                self._tracks.setdefault(camera_id, []).append(FaceTrack(box, name, distance, encoding, signature, now))
+                return
+            track.box = track.anchor_box = box
+            track.signature = signature
+            track.name, track.distance, track.encoding = name, distance, encoding
+            track.identified_at = track.last_seen = now
+
+    def rematch(self, match):
+        """Re-score cached encodings after the gallery changes (match: encoding -> (name, distance))"""
+        with self._lock:
+            cached = [(t, t.encoding) for tracks in self._tracks.values() for t in tracks]
+        # Match outside the lock, then apply only where update() has not replaced the encoding meanwhile
+        scores = [(track, encoding, match(encoding) if encoding is not None else None) for track, encoding in cached]
+        with self._lock:
+            for track, encoding, score in scores:
+                if track.encoding is not encoding:
+                    continue
+                if score is None:
+                    track.identified_at = 0.0  # forces re-identification on the next frame
+                else:
+                    track.name, track.distance = score
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cameras": len(self._tracks),
+                "tracks": sum(len(tracks) for tracks in self._tracks.values()),
+                **self.counts
+            }
+
+class FaceAnalysis:
+    """Colour conversion, HOG box and FaceMesh landmarks for one frame.
+
+    Shared by liveness scoring and encoding so each image is converted and
+    HOG-detected once; FaceMesh then only sees the padded HOG crop. box is the
+    largest HOG detection in (top, right, bottom, left) order; landmarks is an
+    (N, 2) float32 array of FaceMesh x, y normalized to the full frame.
+    """
+
+    def __init__(self, image, rgb, landmarks=None, box=None, mesh_error=None):
+        self.image = image
+        self.rgb = rgb
+        self.landmarks = landmarks
+        self.box = box
+        self.mesh_error = mesh_error
+
+    def padded_box(self, padding=0.15):
+        """The face box grown by padding on each side, clipped to the frame"""
+        top, right, bottom, left = self.box
+        height, width = self.image.shape[:2]
+        pad_y = int((bottom - top) * padding)
+        pad_x = int((right - left) * padding)
+        return max(0, top - pad_y), min(width, right + pad_x), min(height, bottom + pad_y), max(0, left - pad_x)
+
+    def padded_crop(self, padding=0.15):
+        if self.box is None:
+            return None
+        top, right, bottom, left = self.padded_box(padding)
+        return self.image[top:bottom, left:right]
+
+class LivenessResult:
+    """Liveness heuristics for one face: the total score plus each raw metric"""
+
+    def __init__(self, is_live, score=None, ear=None, texture_variance=None, edge_density=None,
+                 face_ratio=None, reasons=None, message=""):
+        self.is_live = is_live
+        self.score = score
+        self.ear = ear
+        self.texture_variance = texture_variance
+        self.edge_density = edge_density
+        self.face_ratio = face_ratio
+        self.reasons = reasons or []
+        self.message = message
+
+    def to_dict(self):
+        return {
+            "is_live": self.is_live,
+            "score": self.score,
+            "ear": self.ear,
+            "texture_variance": self.texture_variance,
+            "edge_density": self.edge_density,
+            "face_ratio": self.face_ratio,
+            "reasons": self.reasons
+        }
 
 class FaceRecognitionSystem:
     def __init__(self):
-        self.known_face_encodings = []
-        self.known_face_names = []
+        # Gallery index: "exact" brute-force scan or "ivf" approximate search
+        self.index_mode = os.getenv('FACE_INDEX_MODE', 'exact').lower()
+        index = None
+        if self.index_mode == 'ivf':
+            index = IVFIndex(
+                nlist=int(os.getenv('FACE_INDEX_NLIST', '0')),
+                nprobe=int(os.getenv('FACE_INDEX_NPROBE', '8')),
+                min_train_size=int(os.getenv('FACE_INDEX_MIN_SIZE', '1024'))
+            )
+        self.gallery = FaceGallery(index=index)
         self.face_database = {}
         self.db_path = "face_database.db"
-        self.encodings_path = "face_encodings.pkl"
+        self.db = SQLiteConnectionManager(
+            self.db_path,
+            pool_size=int(os.getenv('DB_POOL_SIZE', '8')),
+            cache_size_kb=int(os.getenv('DB_CACHE_SIZE_KB', '16384')),
+            mmap_size=int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+        )
+        self.encodings_path = "face_encodings.pkl"  # legacy format, migrated on startup
+        self.gallery_store = GalleryStore(os.getenv('GALLERY_PATH', 'face_gallery'))
         
         # Domain separation configuration
         self.esp32_stream_domain = os.getenv('ESP32_STREAM_DOMAIN', 'streamesp32facecam.myfreeiot.win')
@@ -52,20 +2212,172 @@ class FaceRecognitionSystem:
         self.detection_confidence = 0.5
         self.recognition_threshold = 0.25  # Very low for easier recognition
         
+        # HOG detection runs on a downscaled copy; encodings still use full resolution.
+        # "adaptive" starts without upsampling and only upsamples when nothing is found.
+        self.detect_scale = float(os.getenv('FACE_DETECT_SCALE', '1.0'))
+        self.detect_mode = os.getenv('FACE_DETECT_MODE', 'fixed').lower()
+        self.detect_upsample = int(os.getenv('FACE_DETECT_UPSAMPLE', '1'))
+        self.detection_stats = {}
+        self._detection_stats_lock = threading.Lock()
+        
+        # Enrollment stops waiting once this many encodings scored at least
+        # enroll_quality_score (0 disables the early exit)
+        self.enroll_early_exit = int(os.getenv('ENROLL_EARLY_EXIT', '0'))
+        self.enroll_quality_score = int(os.getenv('ENROLL_QUALITY_SCORE', '60'))
+        
+        # Long-lived FaceMesh graphs shared by liveness checks
+        self.face_mesh_pool = ModelPool(
+            "FaceMesh",
+            lambda: mp_face_mesh.FaceMesh(
+                static_image_mode=True,
+                max_num_faces=1,
+                refine_landmarks=True,
+                min_detection_confidence=0.5
+            ),
+            # A worker process handles one task at a time, so one graph is enough
+            size=1 if IN_WORKER_PROCESS else int(os.getenv('FACEMESH_POOL_SIZE', '4'))
+        )
+        
+        # Cross-frame tracking per camera: steady faces skip encoding and matching.
+        # Opt-in, and only for callers that send an explicit camera id
+        self.tracker = None
+        if os.getenv('FACE_TRACKING', '0') == '1':
+            self.tracker = FaceTracker(
+                iou_threshold=float(os.getenv('FACE_TRACK_IOU', '0.3')),
+                drift_iou=float(os.getenv('FACE_TRACK_DRIFT_IOU', '0.5')),
+                max_idle=float(os.getenv('FACE_TRACK_MAX_IDLE', '1.5')),
+                max_age=float(os.getenv('FACE_TRACK_MAX_AGE', '5.0')),
+                max_scale_change=float(os.getenv('FACE_TRACK_MAX_SCALE_CHANGE', '0.25')),
+                min_similarity=float(os.getenv('FACE_TRACK_MIN_SIMILARITY', '0.9'))
+            )
+        
+        # Cascade gate: frame quality, then the MediaPipe face detector, before HOG and encoding.
+        # Opt-in: its rejections change results and the thresholds are per deployment
+        self.gate = None
+        if os.getenv('FACE_GATE', '0') == '1':
+            self.face_detector_pool = ModelPool(
+                "FaceDetection",
+                lambda: mp_face_detection.FaceDetection(
+                    model_selection=int(os.getenv('FACE_GATE_MODEL', '0')),
+                    min_detection_confidence=float(os.getenv('FACE_GATE_MIN_SCORE', '0.5'))
+                ),
+                size=int(os.getenv('FACE_GATE_POOL_SIZE', '4'))
+            )
+            self.gate = FrameGate(
+                self.face_detector_pool,
+                stages=[stage.strip() for stage in os.getenv('FACE_GATE_STAGES', 'brightness,blur,face_detector').split(',')],
+                min_brightness=float(os.getenv('FACE_GATE_MIN_BRIGHTNESS', '20')),
+                max_brightness=float(os.getenv('FACE_GATE_MAX_BRIGHTNESS', '240')),
+                min_sharpness=float(os.getenv('FACE_GATE_MIN_SHARPNESS', '10')),
+                min_face_score=float(os.getenv('FACE_GATE_MIN_SCORE', '0.5'))
+            )
+        
+        # Near-identical face crops from one camera reuse the previous match.
+        # Opt-in, and like tracking only for callers that send an explicit camera id
+        self.result_cache = None
+        if os.getenv('RESULT_CACHE', '0') == '1':
+            self.result_cache = RecognitionCache(
+                max_entries=int(os.getenv('RESULT_CACHE_SIZE', '256')),
+                ttl=float(os.getenv('RESULT_CACHE_TTL', '5.0')),
+                radius=int(os.getenv('RESULT_CACHE_RADIUS', '6'))
+            )
+        
+        # "thread" runs inference on request/executor threads, "process" on a worker pool
+        self.inference_backend = os.getenv('INFERENCE_BACKEND', 'thread').lower()
+        self.backend = None
+        
+        if IN_WORKER_PROCESS:
+            return
+        
+        # Database and gallery load before serving; stats backfill and models warm in the background
+        self.readiness = Readiness(started=_process_started)
+        self.readiness.declare('database', 'gallery', 'log_writer', 'rolling_stats')
+        self.readiness.declare(*(['inference_backend'] if self.inference_backend == 'process' else ['face_recognition', 'facemesh']))
+        if self.gate is not None and 'face_detector' in self.gate.stages:
+            self.readiness.declare('face_detector')
+        
         # Initialize database
-        self.init_database()
-        self.load_encodings()
+        with self.readiness.track('database'):
+            self.init_database()
+        # A failed gallery load keeps /ready at 503 instead of serving an empty gallery
+        with self.readiness.track('gallery', reraise=False):
+            self.load_encodings()
+        
+        # Recognition/domain logs are written behind the request path
+        self.log_writer = LogWriter(
+            self.db,
+            max_queue=int(os.getenv('LOG_QUEUE_SIZE', '10000')),
+            batch_size=int(os.getenv('LOG_BATCH_SIZE', '500')),
+            flush_interval=float(os.getenv('LOG_FLUSH_INTERVAL', '1.0'))
+        )
+        atexit.register(self.log_writer.stop)
+        with self.readiness.track('log_writer'):
+            pass
+        
+        # Last 24h of /domain/stats served from memory, seeded from the logs once;
+        # rows logged after this point are already counted live
+        self.rolling_stats = RollingStats(window_minutes=int(os.getenv('STATS_WINDOW_MINUTES', '1440')))
+        backfill_until = LogWriter._timestamp()
+        threading.Thread(target=self._backfill_stats, args=(backfill_until,), name='stats-backfill', daemon=True).start()
+        
+        # Raw logs are kept for RETENTION_DAYS, then rolled into daily summaries (0 disables)
+        self.log_retention = None
+        retention_days = int(os.getenv('RETENTION_DAYS', '30'))
+        if retention_days > 0:
+            self.log_retention = LogRetention(
+                self.db,
+                retention_days=retention_days,
+                summary_days=int(os.getenv('SUMMARY_RETENTION_DAYS', '365')),
+                interval_hours=float(os.getenv('RETENTION_INTERVAL_HOURS', '6'))
+            )
+        
+        if self.inference_backend == 'process':
+            self.backend = ProcessInferenceBackend(int(os.getenv('INFERENCE_PROCESSES', str(os.cpu_count() or 4))))
+            self.publish_gallery()
+            atexit.register(self.backend.shutdown)
         
         logger.info(f"Domain Separation Config:")
         logger.info(f"  Stream Domain: {self.esp32_stream_domain}")
         logger.info(f"  API Domain: {self.esp32_api_domain}")
         logger.info(f"  Local IP: {self.esp32_local_ip}")
+        logger.info(f"Gallery index mode: {self.index_mode}")
+        logger.info(f"Inference backend: {self.inference_backend}")
+        
+        # Warm from a thread so Flask can bind immediately; with the process backend this
+        # must not block import either, since submitting work pickles functions by module
+        # reference and would deadlock on the import lock while this module is importing
+        threading.Thread(target=self._warm_up, name='model-warmup', daemon=True).start()
+        
+    def _backfill_stats(self, until):
+        with self.readiness.track('rolling_stats', reraise=False):
+            self.rolling_stats.backfill(self.db, until)
+        
+    def _warm_up(self):
+        """Load the models before the first request needs them"""
+        if self.gate is not None and 'face_detector' in self.gate.stages:
+            # The gate runs in this process for both backends
+            with self.readiness.track('face_detector', reraise=False):
+                if not self.face_detector_pool.warm():
+                    raise RuntimeError("no FaceDetection instance could be created")
+        
+        if self.backend is not None:
+            # With the process backend the models live in the workers instead
+            with self.readiness.track('inference_backend', reraise=False):
+                self.backend.warm()
+            return
+        
+        with self.readiness.track('face_recognition', reraise=False):
+            face_recognition.face_locations(np.zeros((64, 64, 3), dtype=np.uint8))
+        with self.readiness.track('facemesh', reraise=False):
+            if not self.face_mesh_pool.warm():
+                raise RuntimeError("no FaceMesh instance could be created")
         
     def init_database(self):
         """Initialize SQLite database for face data"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        with self.db.transaction() as conn:
+            self._create_schema(conn.cursor())
+            
+    def _create_schema(self, cursor):
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS faces (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -100,159 +2412,327 @@ class FaceRecognitionSystem:
             )
         ''')
         
-        conn.commit()
-        conn.close()
+        # Indexes for time-ordered queries and per-domain filtering
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_recognition_logs_timestamp ON recognition_logs (timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_domain_logs_timestamp ON domain_logs (timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_domain_logs_domain_timestamp ON domain_logs (domain, timestamp)")
+        
+        # Daily rollups of log rows past the retention window
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS recognition_daily (
+                day TEXT NOT NULL,
+                domain_used TEXT NOT NULL,
+                name TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                confidence_sum REAL NOT NULL,
+                PRIMARY KEY (day, domain_used, name)
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS domain_daily (
+                day TEXT NOT NULL,
+                domain TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                status TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                response_time_sum REAL NOT NULL,
+                PRIMARY KEY (day, domain, endpoint, status)
+            )
+        ''')
+        
+    def publish_gallery(self):
+        """Republish the gallery to worker processes after it changes"""
+        if self.result_cache is not None:
+            self.result_cache.clear()
+        if self.tracker is not None:
+            self.tracker.rematch(self.gallery.match)
+        if self.backend is not None:
+            names, encodings = self.gallery.snapshot()
+            self.backend.publish(names, encodings)
+            
+    def load_encodings(self):
+        """Map the on-disk gallery into memory, migrating legacy pickles on first run.
+
+        Errors propagate so the gallery readiness component reports them.
+        """
+        start = time.time()
+        if not self.gallery_store.exists():
+            self._migrate_legacy_encodings()
+        names, encodings = self.gallery_store.open()
+        
+        self.gallery.load(names, encodings)
+        if len(self.gallery):
+            logger.info(f"Loaded {len(self.gallery)} face encodings in {(time.time() - start) * 1000:.1f} ms")
+        else:
+            logger.info("No existing encodings found")
+            
+    def _migrate_legacy_encodings(self):
+        """Build the gallery store from legacy encodings; the pickle is retired only on success"""
+        legacy_names, legacy_encodings = self._load_legacy_encodings()
+        if not legacy_names:
+            return
+        
+        skipped = self.gallery_store.import_all(legacy_names, legacy_encodings)
+        for name, reason in skipped:
+            logger.error(f"Legacy face '{name}' was not migrated: {reason}")
+        logger.info(f"Migrated {len(legacy_names) - len(skipped)} legacy face encodings to {self.gallery_store.encodings_file}")
+        
+        if os.path.exists(self.encodings_path):
+            # Kept as .migrated, so skipped entries can still be recovered by hand
+            os.replace(self.encodings_path, self.encodings_path + '.migrated')
+            
+    def _load_legacy_encodings(self):
+        """Encodings from face_encodings.pkl, or the pickled BLOBs in the faces table"""
+        if os.path.exists(self.encodings_path):
+            with open(self.encodings_path, 'rb') as f:
+                data = pickle.load(f)
+            return list(data['names']), list(data['encodings'])
+        
+        names, encodings = [], []
+        with self.db.connection() as conn:
+            for name, blob in conn.execute("SELECT name, encoding FROM faces"):
+                if blob:
+                    names.append(name)
+                    encodings.append(pickle.loads(blob))
+        return names, encodings
+            
+    def log_domain_access(self, domain, endpoint, status, response_time):
+        """Log domain access for monitoring separation (queued, written in batches)"""
+        try:
+            self.rolling_stats.record_domain(domain, endpoint, status, response_time)
+            self.log_writer.log_domain_access(domain, endpoint, status, response_time)
+        except Exception as e:
+            logger.error(f"Domain logging error: {e}")
+                
+    def _detection_passes(self):
+        """(scale, upsample) attempts in order for the configured detection mode"""
+        scale = min(max(self.detect_scale, 0.1), 1.0)
+        if self.detect_mode != 'adaptive':
+            return [(scale, self.detect_upsample)]
+        passes = [(scale, 0), (scale, 1)]
+        if scale < 1.0:
+            passes.append((1.0, 1))
+        return passes
+        
+    def _record_detection_pass(self, label, elapsed, found):
+        with self._detection_stats_lock:
+            stats = self.detection_stats.setdefault(label, {"calls": 0, "hits": 0, "total_ms": 0.0})
+            stats["calls"] += 1
+            stats["hits"] += int(found)
+            stats["total_ms"] += elapsed * 1000.0
+        
+    def detect_faces(self, rgb_image):
+        """HOG face detection on a downscaled frame, boxes mapped back to full resolution"""
+        with timed_stage('detection'):
+            return self._detect_faces(rgb_image)
+        
+    def _detect_faces(self, rgb_image):
+        height, width = rgb_image.shape[:2]
+        resized = {}
+        timings = []
+        
+        for scale, upsample in self._detection_passes():
+            label = f"{scale:.2f}x/up{upsample}"
+            start = time.time()
+            if scale < 1.0:
+                if scale not in resized:
+                    resized[scale] = cv2.resize(rgb_image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                frame = resized[scale]
+            else:
+                frame = rgb_image
+            
+            locations = face_recognition.face_locations(frame, model="hog", number_of_times_to_upsample=upsample)
+            elapsed = time.time() - start
+            self._record_detection_pass(label, elapsed, bool(locations))
+            timings.append(f"{label}={elapsed * 1000:.1f}ms")
+            
+            if locations:
+                if scale < 1.0:
+                    locations = [
+                        (max(0, int(round(top / scale))), min(width, int(round(right / scale))),
+                         min(height, int(round(bottom / scale))), max(0, int(round(left / scale))))
+                        for top, right, bottom, left in locations
+                    ]
+                logger.debug(f"Face detection: {', '.join(timings)}")
+                return locations
+        
+        logger.debug(f"Face detection (no face): {', '.join(timings)}")
+        return []
+        
+    def locate_face(self, rgb_image):
+        """(box, message) of the largest detected face"""
+        face_locations = self.detect_faces(rgb_image)
+        if not face_locations:
+            return None, "No face found in image"
+        return max(face_locations, key=lambda x: (x[2]-x[0])*(x[1]-x[3])), "Success"
+        
+    # FaceMesh runs its own detector first, which misses faces that fill the
+    # whole input, so it gets a looser crop than the texture metrics
+    MESH_PADDING = 0.4
+    
+    def analyze_face(self, image):
+        """Convert once, find the face box with HOG, then run FaceMesh on its crop.
+
+        The box always comes from detect_faces, exactly as on the recognition
+        paths: dlib's shape predictor is trained on HOG-detector framing, so
+        enrollment templates and probes must be aligned from the same kind of box.
+        """
+        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        analysis = FaceAnalysis(image, rgb_image)
+        analysis.box, _ = self.locate_face(rgb_image)
+        if analysis.box is None:
+            return analysis
         
-    def save_encodings(self):
-        """Save face encodings to pickle file"""
+        top, right, bottom, left = analysis.padded_box(self.MESH_PADDING)
         try:
-            data = {
-                'encodings': self.known_face_encodings,
-                'names': self.known_face_names
-            }
-            with open(self.encodings_path, 'wb') as f:
-                pickle.dump(data, f)
-            logger.info("Face encodings saved successfully")
+            with timed_stage('liveness_facemesh'):
+                results = self.face_mesh_pool.process(np.ascontiguousarray(rgb_image[top:bottom, left:right]))
+            if results.multi_face_landmarks:
+                # One pass over the protobuf landmarks, then map crop coordinates back to the frame
+                height, width = image.shape[:2]
+                landmarks = np.array(
+                    [(lm.x, lm.y) for lm in results.multi_face_landmarks[0].landmark], dtype=np.float32
+                )
+                landmarks[:, 0] = (left + landmarks[:, 0] * (right - left)) / width
+                landmarks[:, 1] = (top + landmarks[:, 1] * (bottom - top)) / height
+                analysis.landmarks = landmarks
         except Exception as e:
-            logger.error(f"Error saving encodings: {e}")
-            
-    def load_encodings(self):
-        """Load face encodings from pickle file"""
+            logger.error(f"FaceMesh error: {e}")
+            analysis.mesh_error = e
+        return analysis
+        
+    # FaceMesh eye contours: corner, upper, upper, corner, lower, lower
+    EYE_LANDMARKS = np.array([
+        [33, 160, 158, 133, 153, 144],
+        [362, 385, 387, 263, 373, 380]
+    ])
+    
+    # Provisional texture/edge thresholds for the padded face crop. The
+    # full-frame values (variance > 40, 0.01 < density < 0.25) do not carry
+    # over: a face crop has far more edges than a frame that is mostly wall,
+    # and the old upper bound rejected sharp face crops. The new range only
+    # comes from the synthetic sample in benchmarks/liveness_calibration.py,
+    # which is one photo and so measures sharp vs blurred rather than live vs
+    # spoof (simulated screen replays still pass 78.5%). Treat it as a
+    # placeholder until the script has been run with --live/--spoof on real
+    # door captures.
+    TEXTURE_MIN_VARIANCE = 40.0
+    EDGE_DENSITY_RANGE = (0.03, 0.35)
+    
+    # Minimum face box area as a share of the frame. The box is the HOG box,
+    # which stops at the eyebrows; its area is estimated at about 1/1.3 of the
+    # FaceMesh extents the old 0.02 was chosen for, so the bound is scaled to
+    # match. Also provisional: the calibration script reports its pass rate.
+    MIN_FACE_RATIO = 0.015
+    
+    @staticmethod
+    def texture_metrics(gray):
+        """(Laplacian variance, Canny edge density) of a grayscale face crop"""
+        with timed_stage('liveness_laplacian'):
+            texture_variance = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+        with timed_stage('liveness_canny'):
+            edges = cv2.Canny(gray, 50, 150)
+            edge_density = float(np.count_nonzero(edges)) / edges.size
+        return texture_variance, edge_density
+        
+    def detect_liveness(self, image, analysis=None):
+        """Relaxed liveness detection for better UX: (is_live, message)"""
+        result = self.score_liveness(image, analysis)
+        return result.is_live, result.message
+        
+    def score_liveness(self, image, analysis=None):
+        """Liveness heuristics as a LivenessResult.
+
+        Texture and edge metrics run on the padded face crop only, so the cost
+        follows the face size rather than the sensor resolution.
+        """
         try:
-            if os.path.exists(self.encodings_path):
-                with open(self.encodings_path, 'rb') as f:
-                    data = pickle.load(f)
-                    self.known_face_encodings = data['encodings']
-                    self.known_face_names = data['names']
-                logger.info(f"Loaded {len(self.known_face_names)} face encodings")
+            height, width = image.shape[:2]
+            
+            if analysis is None:
+                analysis = self.analyze_face(image)
+            if analysis.mesh_error is not None:
+                raise analysis.mesh_error
+            
+            if analysis.landmarks is None or analysis.box is None:
+                return LivenessResult(False, message="No face detected")
+            
+            # Eye Aspect Ratio for both eyes at once: (2 eyes, 6 points, xy)
+            eyes = analysis.landmarks[self.EYE_LANDMARKS]
+            vertical = np.abs(eyes[:, 1, 1] - eyes[:, 5, 1]) + np.abs(eyes[:, 2, 1] - eyes[:, 4, 1])
+            horizontal = np.abs(eyes[:, 0, 0] - eyes[:, 3, 0])
+            ear = float(np.mean(vertical / (2.0 * np.maximum(horizontal, 1e-6))))
+            
+            # Texture and edge density analysis
+            gray = cv2.cvtColor(analysis.padded_crop(), cv2.COLOR_BGR2GRAY)
+            texture_variance, edge_density = self.texture_metrics(gray)
+            
+            # Face size analysis
+            top, right, bottom, left = analysis.box
+            face_ratio = (right - left) * (bottom - top) / float(width * height)
+            
+            # Relaxed scoring for better UX
+            liveness_score = 0
+            reasons = []
+            
+            # Eye openness check (very tolerant)
+            if 0.08 < ear < 0.50:
+                liveness_score += 20
             else:
-                logger.info("No existing encodings found")
-        except Exception as e:
-            logger.error(f"Error loading encodings: {e}")
+                reasons.append(f"Eye ratio: {ear:.3f}")
             
-    def log_domain_access(self, domain, endpoint, status, response_time):
-        """Log domain access for monitoring separation"""
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            # Texture variance (very low threshold)
+            if texture_variance > self.TEXTURE_MIN_VARIANCE:
+                liveness_score += 25
+            else:
+                reasons.append(f"Low texture: {texture_variance:.1f}")
             
-            cursor.execute(
-                "INSERT INTO domain_logs (domain, endpoint, status, response_time) VALUES (?, ?, ?, ?)",
-                (domain, endpoint, status, response_time)
-            )
-            conn.commit()
+            # Edge density (very tolerant)
+            if self.EDGE_DENSITY_RANGE[0] < edge_density < self.EDGE_DENSITY_RANGE[1]:
+                liveness_score += 20
+            else:
+                reasons.append(f"Edge density: {edge_density:.3f}")
             
-        except Exception as e:
-            logger.error(f"Domain logging error: {e}")
-        finally:
-            if conn:
-                conn.close()
-                
-    def detect_liveness(self, image):
-        """Relaxed liveness detection for better UX"""
-        try:
-            height, width = image.shape[:2]
+            # Face size (very lenient)
+            if face_ratio > self.MIN_FACE_RATIO:
+                liveness_score += 15
+            else:
+                reasons.append(f"Face too small: {face_ratio:.3f}")
             
-            with mp_face_mesh.FaceMesh(
-                static_image_mode=True,
-                max_num_faces=1,
-                refine_landmarks=True,
-                min_detection_confidence=0.5
-            ) as face_mesh:
-                
-                rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                results = face_mesh.process(rgb_image)
-                
-                if not results.multi_face_landmarks:
-                    return False, "No face detected"
-                
-                landmarks = results.multi_face_landmarks[0].landmark
-                
-                # Eye Aspect Ratio calculation
-                left_eye_points = [33, 160, 158, 133, 153, 144]
-                right_eye_points = [362, 385, 387, 263, 373, 380]
-                
-                def calculate_ear(eye_points, landmarks):
-                    h1 = abs(landmarks[eye_points[1]].y - landmarks[eye_points[5]].y)
-                    h2 = abs(landmarks[eye_points[2]].y - landmarks[eye_points[4]].y)
-                    w = abs(landmarks[eye_points[0]].x - landmarks[eye_points[3]].x)
-                    return (h1 + h2) / (2.0 * w)
-                
-                left_ear = calculate_ear(left_eye_points, landmarks)
-                right_ear = calculate_ear(right_eye_points, landmarks)
-                ear = (left_ear + right_ear) / 2.0
-                
-                # Texture analysis
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-                laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-                texture_variance = laplacian.var()
-                
-                # Edge density analysis
-                edges = cv2.Canny(gray, 50, 150)
-                edge_density = np.sum(edges > 0) / (width * height)
-                
-                # Face size analysis
-                face_bbox = [
-                    min([lm.x for lm in landmarks]) * width,
-                    min([lm.y for lm in landmarks]) * height,
-                    max([lm.x for lm in landmarks]) * width,
-                    max([lm.y for lm in landmarks]) * height
-                ]
-                face_area = (face_bbox[2] - face_bbox[0]) * (face_bbox[3] - face_bbox[1])
-                face_ratio = face_area / (width * height)
-                
-                # Relaxed scoring for better UX
-                liveness_score = 0
-                reasons = []
-                
-                # Eye openness check (very tolerant)
-                if 0.08 < ear < 0.50:
-                    liveness_score += 20
-                else:
-                    reasons.append(f"Eye ratio: {ear:.3f}")
-                
-                # Texture variance (very low threshold)
-                if texture_variance > 40:
-                    liveness_score += 25
-                else:
-                    reasons.append(f"Low texture: {texture_variance:.1f}")
-                
-                # Edge density (very tolerant)
-                if 0.01 < edge_density < 0.25:
-                    liveness_score += 20
-                else:
-                    reasons.append(f"Edge density: {edge_density:.3f}")
-                
-                # Face size (very lenient)
-                if face_ratio > 0.02:
-                    liveness_score += 15
-                else:
-                    reasons.append(f"Face too small: {face_ratio:.3f}")
-                
-                # Always give some points for basic detection
-                liveness_score += 20  # Bonus points for having a detectable face
-                
-                logger.info(f"Liveness analysis - Score: {liveness_score}/100, EAR: {ear:.3f}, Texture: {texture_variance:.1f}")
+            # Always give some points for basic detection
+            liveness_score += 20  # Bonus points for having a detectable face
+            
+            logger.info(f"Liveness analysis - Score: {liveness_score}/100, EAR: {ear:.3f}, Texture: {texture_variance:.1f}")
+            
+            # Very relaxed threshold
+            is_live = liveness_score >= 40  # Much lower than before
+            if is_live:
+                message = f"Live face detected (score: {liveness_score}/100)"
+            else:
+                message = f"Possible fake detected (score: {liveness_score}/100) - {'; '.join(reasons[:2])}"
+            return LivenessResult(is_live, liveness_score, ear, texture_variance, edge_density, face_ratio, reasons, message)
                 
-                # Very relaxed threshold
-                if liveness_score >= 40:  # Much lower than before
-                    return True, f"Live face detected (score: {liveness_score}/100)"
-                else:
-                    reason_text = "; ".join(reasons[:2])
-                    return False, f"Possible fake detected (score: {liveness_score}/100) - {reason_text}"
-                    
         except Exception as e:
             logger.error(f"Liveness detection error: {e}")
-            return True, "Liveness check skipped - assuming live"  # Default to allow
+            return LivenessResult(True, message="Liveness check skipped - assuming live")  # Default to allow
             
-    def extract_face_encoding(self, image):
-        """Extract face encoding from image"""
+    def extract_face_encoding(self, image, analysis=None):
+        """Extract face encoding from image, reusing a FaceAnalysis box when given"""
         try:
+            if analysis is not None:
+                if analysis.box is None:
+                    return None, "No face found in image"
+                with timed_stage('encoding'):
+                    face_encodings = face_recognition.face_encodings(analysis.rgb, [analysis.box])
+                if not face_encodings:
+                    return None, "Could not extract face features"
+                return face_encodings[0], "Success"
+            
             rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
             
-            # Find face locations with relaxed parameters
-            face_locations = face_recognition.face_locations(rgb_image, model="hog", number_of_times_to_upsample=1)
+            # Find face locations on the (optionally downscaled) detection frame
+            face_locations = self.detect_faces(rgb_image)
             
             if not face_locations:
                 return None, "No face found in image"
@@ -262,7 +2742,8 @@ class FaceRecognitionSystem:
                 face_locations = [max(face_locations, key=lambda x: (x[2]-x[0])*(x[1]-x[3]))]
             
             # Extract face encoding
-            face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
+            with timed_stage('encoding'):
+                face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
             
             if not face_encodings:
                 return None, "Could not extract face features"
@@ -273,35 +2754,86 @@ class FaceRecognitionSystem:
             logger.error(f"Face encoding error: {e}")
             return None, f"Error: {str(e)}"
             
+    def analyze_enrollment_image(self, image):
+        """Liveness score and encoding for one enrollment image: (encoding, security_score, message)
+
+        image may be a decoded BGR array or the raw upload bytes; undecodable
+        uploads get a None score so they do not drag down the average.
+        """
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            image = decode_image_bytes(image)
+            if image is None:
+                return None, None, "Could not decode image"
+        
+        # One detection pass shared by liveness and encoding
+        analysis = self.analyze_face(image)
+        
+        # Very lenient liveness detection; skipped checks count as a neutral 50
+        liveness = self.score_liveness(image, analysis)
+        security_score = liveness.score if liveness.score is not None else 50
+        
+        # Extract encoding regardless of liveness score
+        encoding, msg = self.extract_face_encoding(image, analysis)
+        return encoding, security_score, msg
+        
+    def _submit_enrollment_analysis(self, image):
+        if self.backend is not None:
+            return self.backend.executor.submit(_worker_analyze_enrollment, image)
+        return inference_executor.submit(self.analyze_enrollment_image, image)
+        
     def enroll_face(self, images, name):
-        """Enroll a new face with relaxed security for better UX"""
-        conn = None
+        """Enroll a new face with relaxed security for better UX
+
+        Images (decoded arrays or raw upload bytes) are decoded, liveness-scored
+        and encoded concurrently on the inference pool.
+        """
         try:
             if len(images) < 2:  # Reduced from 3 to 2
                 return False, "Need at least 2 images for enrollment"
             
+            name_error = self.gallery_store.validate_name(name)
+            if name_error:
+                return False, name_error
+            
             encodings = []
             security_scores = []
             
-            # Process each image with very lenient checks
+            # Fan out one pipeline task per distinct image (the route duplicates single uploads)
+            submitted = {}
+            futures = {}
             for i, image in enumerate(images):
-                logger.info(f"Processing enrollment image {i+1}/{len(images)}")
-                
-                # Very lenient liveness detection
-                is_live, liveness_msg = self.detect_liveness(image)
+                future = submitted.get(id(image))
+                if future is None:
+                    future = submitted[id(image)] = self._submit_enrollment_analysis(image)
+                futures.setdefault(future, []).append(i)
+            
+            # Process each image with very lenient checks
+            high_quality = 0
+            for future in as_completed(futures):
+                indices = futures[future]
+                try:
+                    encoding, security_score, msg = future.result()
+                except Exception as e:
+                    encoding, security_score, msg = None, 50, f"Error: {str(e)}"
                 
-                # Extract score
-                score_match = re.search(r'score: (\d+)/100', liveness_msg)
-                security_score = int(score_match.group(1)) if score_match else 50
-                security_scores.append(security_score)
+                for i in indices:
+                    if security_score is not None:
+                        security_scores.append(security_score)
+                    if encoding is not None:
+                        encodings.append(encoding)
+                        logger.info(f"Successfully extracted encoding from image {i+1}/{len(images)} (security: {security_score}/100)")
+                    else:
+                        logger.warning(f"Failed to extract encoding from image {i+1}/{len(images)}: {msg}")
                 
-                # Extract encoding regardless of liveness score
-                encoding, msg = self.extract_face_encoding(image)
-                if encoding is not None:
-                    encodings.append(encoding)
-                    logger.info(f"Successfully extracted encoding from image {i+1} (security: {security_score}/100)")
-                else:
-                    logger.warning(f"Failed to extract encoding from image {i+1}: {msg}")
+                if encoding is not None and security_score >= self.enroll_quality_score:
+                    high_quality += len(indices)
+                if self.enroll_early_exit and high_quality >= self.enroll_early_exit:
+                    pending = [f for f in futures if not f.done()]
+                    for f in pending:
+                        f.cancel()
+                    if pending:
+                        logger.info(f"Enrollment early exit: {high_quality} high-quality encodings, skipped {len(pending)} images")
+                    break
             
             if len(encodings) < 1:
                 return False, "Could not extract any valid face encodings"
@@ -316,25 +2848,18 @@ class FaceRecognitionSystem:
             avg_security = sum(security_scores) / len(security_scores) if security_scores else 50
             logger.info(f"Average security score: {avg_security:.1f}/100")
             
-            # Save to database
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "INSERT OR REPLACE INTO faces (name, encoding, images_count) VALUES (?, ?, ?)",
-                (name, pickle.dumps(avg_encoding), len(encodings))
-            )
-            conn.commit()
+            # Save to database (metadata only; the gallery store holds the encoding).
+            # The store is written inside the transaction, so a failed put rolls the row back.
+            with timed_stage('db_write'), self.db.transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO faces (name, encoding, images_count) VALUES (?, ?, ?)",
+                    (name, b'', len(encodings))
+                )
+                self.gallery_store.put(name, avg_encoding)
             
             # Update in-memory storage
-            if name in self.known_face_names:
-                idx = self.known_face_names.index(name)
-                self.known_face_encodings[idx] = avg_encoding
-            else:
-                self.known_face_names.append(name)
-                self.known_face_encodings.append(avg_encoding)
-            
-            self.save_encodings()
+            self.gallery.upsert(name, avg_encoding)
+            self.publish_gallery()
             
             logger.info(f"Successfully enrolled {name} with {len(encodings)} images")
             return True, f"Successfully enrolled {name} with {len(encodings)} images (security: {avg_security:.1f}/100)"
@@ -344,62 +2869,247 @@ class FaceRecognitionSystem:
         except Exception as e:
             logger.error(f"Enrollment error: {e}")
             return False, f"Enrollment failed: {str(e)}"
-        finally:
-            if conn:
-                conn.close()
                 
-    def recognize_face(self, image, domain_used="unknown"):
+    def gate_frame(self, image):
+        """FrameRejection if the cascade gate turns the frame away, else None"""
+        if self.gate is None:
+            return None
+        return self.gate.check(image)
+            
+    def gate_frame_bytes(self, data):
+        if self.gate is None:
+            return None
+        return self.gate.check_bytes(data)
+            
+    @property
+    def _reuses_matches(self):
+        return self.tracker is not None or self.result_cache is not None
+            
+    def _known_match(self, camera_id, box, signature):
+        """(name, distance) from the face tracker or the result cache, or None to encode and match"""
+        if self.tracker is not None:
+            track = self.tracker.lookup(camera_id, box, signature)
+            if track is not None:
+                return track.name, track.distance
+        if self.result_cache is not None and signature is not None:
+            cached = self.result_cache.get(camera_id, signature)
+            if cached is not None:
+                logger.info(f"Recognition cache hit: {cached[0]} (camera {camera_id})")
+                return cached
+        return None
+            
+    def _remember_match(self, camera_id, box, signature, best_name, distance, encoding):
+        if self.tracker is not None:
+            self.tracker.update(camera_id, box, best_name, distance, encoding, signature)
+        if self.result_cache is not None and signature is not None and best_name is not None:
+            self.result_cache.put(camera_id, signature, (best_name, distance))
+            
+    @property
+    def _signature_size(self):
+        return self.tracker.signature_size if self.tracker is not None else 16
+            
+    def recognize_face(self, image, domain_used="unknown", camera_id=None):
+        """Recognize face; with a camera id, tracked or cached faces skip encoding
+
+        Frames the cascade gate rejects return early without detection or encoding.
+        """
+        return self.recognize_face_gated(image, domain_used, camera_id)[0]
+            
+    def recognize_face_gated(self, image, domain_used="unknown", camera_id=None):
+        """recognize_face, plus the FrameRejection when the gate turned the frame away (else None)"""
+        if len(self.gallery) == 0:
+            return (None, 0.0, "No enrolled faces in database", False), None
+        rejection = self.gate_frame(image)
+        if rejection is not None:
+            return (None, 0.0, rejection.message, False), rejection
+        return self._recognize_face(image, domain_used, camera_id), None
+            
+    def _recognize_face(self, image, domain_used="unknown", camera_id=None):
         """Recognize face with very relaxed thresholds"""
         try:
-            if not self.known_face_encodings:
+            if len(self.gallery) == 0:
                 return None, 0.0, "No enrolled faces in database", False
             
+            if camera_id is not None and self._reuses_matches:
+                return self._recognize_tracked(image, domain_used, camera_id)
+            
             # Extract face encoding
             encoding, msg = self.extract_face_encoding(image)
             if encoding is None:
                 return None, 0.0, msg, False
             
             # Compare with known faces
-            face_distances = face_recognition.face_distance(self.known_face_encodings, encoding)
-            best_match_index = np.argmin(face_distances)
-            confidence = 1 - face_distances[best_match_index]
+            with timed_stage('gallery_match'):
+                best_name, distance = self.gallery.match(encoding)
+            return self._finish_recognition(best_name, distance, domain_used)
+                
+        except Exception as e:
+            logger.error(f"Recognition error: {e}")
+            return None, 0.0, f"Recognition failed: {str(e)}", False
+            
+    def _recognize_tracked(self, image, domain_used, camera_id):
+        """Detect every frame, but encode and match only when neither the tracker nor the cache knows the face"""
+        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        box, msg = self.locate_face(rgb_image)
+        if box is None:
+            return None, 0.0, msg, False
+        
+        signature = FaceTracker.signature(rgb_image, box, self._signature_size)
+        known = self._known_match(camera_id, box, signature)
+        if known is not None:
+            return self._finish_recognition(known[0], known[1], domain_used)
+        
+        with timed_stage('encoding'):
+            face_encodings = face_recognition.face_encodings(rgb_image, [box])
+        if not face_encodings:
+            return None, 0.0, "Could not extract face features", False
+        with timed_stage('gallery_match'):
+            best_name, distance = self.gallery.match(face_encodings[0])
+        self._remember_match(camera_id, box, signature, best_name, distance, face_encodings[0])
+        return self._finish_recognition(best_name, distance, domain_used)
+            
+    def recognize_image_bytes(self, data, domain_used="unknown", camera_id=None):
+        """Recognize an encoded image; decoding and inference run in a worker process when enabled"""
+        return self.recognize_image_bytes_gated(data, domain_used, camera_id)[0]
+            
+    def recognize_image_bytes_gated(self, data, domain_used="unknown", camera_id=None):
+        """recognize_image_bytes, plus the FrameRejection when the gate turned the frame away (else None)"""
+        if self.backend is None:
+            image = decode_image_bytes(data)
+            if image is None:
+                return (None, 0.0, "No valid image provided", False), None
+            return self.recognize_face_gated(image, domain_used, camera_id)
+        
+        if len(self.gallery) == 0:
+            return (None, 0.0, "No enrolled faces in database", False), None
+        rejection = self.gate_frame_bytes(data)
+        if rejection is not None:
+            return (None, 0.0, rejection.message, False), rejection
+        return self._recognize_image_bytes(data, domain_used, camera_id), None
+            
+    def _recognize_image_bytes(self, data, domain_used="unknown", camera_id=None):
+        """Worker-process recognition of an encoded image"""
+        try:
+            if len(self.gallery) == 0:
+                return None, 0.0, "No enrolled faces in database", False
+            
+            if camera_id is not None and self._reuses_matches:
+                with timed_stage('inference'):
+                    box, signature, msg = self.backend.locate(data, self._signature_size)
+                if box is None:
+                    return None, 0.0, msg, False
+                known = self._known_match(camera_id, box, signature)
+                if known is not None:
+                    return self._finish_recognition(known[0], known[1], domain_used)
+                with timed_stage('inference'):
+                    best_name, distance, encoding, msg = self.backend.recognize_at(data, box)
+                if encoding is None:
+                    return None, 0.0, msg, False
+                self._remember_match(camera_id, box, signature, best_name, distance, encoding)
+                return self._finish_recognition(best_name, distance, domain_used)
+            
+            with timed_stage('inference'):
+                best_name, distance, msg = self.backend.recognize(data)
+            if best_name is None and distance == float('inf'):
+                return None, 0.0, msg, False
+            return self._finish_recognition(best_name, distance, domain_used)
+            
+        except Exception as e:
+            logger.error(f"Recognition error: {e}")
+            return None, 0.0, f"Recognition failed: {str(e)}", False
+            
+    def _finish_recognition(self, best_name, distance, domain_used):
+        """Apply the threshold to a gallery match and log successes"""
+        try:
+            if best_name is None:
+                return None, 0.0, "No enrolled faces in database", False
+            confidence = 1 - distance
             
             # Very relaxed threshold for recognition
             if confidence > self.recognition_threshold:
-                name = self.known_face_names[best_match_index]
+                name = best_name
                 
                 # Log recognition with domain info
                 self.log_recognition(name, confidence, domain_used)
                 
                 logger.info(f"Recognition successful: {name} ({confidence:.2f}) via {domain_used}")
+                RECOGNITION_RESULTS.inc(result='recognized')
                 return name, confidence, "Recognition successful", True
             else:
                 logger.info(f"Face not recognized - confidence: {confidence:.2f}")
+                RECOGNITION_RESULTS.inc(result='unknown')
                 return "Unknown", confidence, f"Low confidence: {confidence:.2f} (need >{self.recognition_threshold})", False
                 
         except Exception as e:
             logger.error(f"Recognition error: {e}")
             return None, 0.0, f"Recognition failed: {str(e)}", False
             
+    def recognize_batch(self, images, domain_used="unknown", executor=None):
+        """Recognize several frames: encodings extracted concurrently, matched in one pass.
+
+        Returns a list of (name, confidence, message, success) in input order;
+        None entries in images (undecodable uploads) yield a failed result.
+        """
+        results = [(None, 0.0, "No valid image provided", False)] * len(images)
+        if len(self.gallery) == 0:
+            return [(None, 0.0, "No enrolled faces in database", False)] * len(images)
+        
+        executor = executor or inference_executor
+        extract = self.backend.encode if self.backend is not None else self.extract_face_encoding
+        
+        def encode(image):
+            rejection = self.gate_frame(image)
+            if rejection is not None:
+                return None, rejection.message
+            return extract(image)
+        
+        futures = {
+            i: executor.submit(encode, image)
+            for i, image in enumerate(images) if image is not None
+        }
+        
+        encoded = []
+        for i, future in futures.items():
+            try:
+                encoding, msg = future.result()
+            except Exception as e:
+                logger.error(f"Batch encoding error (image {i}): {e}")
+                encoding, msg = None, f"Recognition failed: {str(e)}"
+            if encoding is None:
+                results[i] = (None, 0.0, msg, False)
+            else:
+                encoded.append((i, encoding))
+        
+        if encoded:
+            with timed_stage('gallery_match'):
+                matches = self.gallery.match_many([encoding for _, encoding in encoded])
+            for (i, _), (best_name, distance) in zip(encoded, matches):
+                confidence = 1 - distance
+                if best_name is not None and confidence > self.recognition_threshold:
+                    self.log_recognition(best_name, confidence, domain_used)
+                    RECOGNITION_RESULTS.inc(result='recognized')
+                    results[i] = (best_name, confidence, "Recognition successful", True)
+                else:
+                    RECOGNITION_RESULTS.inc(result='unknown')
+                    results[i] = ("Unknown", confidence, f"Low confidence: {confidence:.2f} (need >{self.recognition_threshold})", False)
+        
+        recognized = sum(1 for result in results if result[3])
+        logger.info(f"Batch recognition: {recognized}/{len(images)} recognized via {domain_used}")
+        return results
+        
     def delete_face(self, name):
         """Delete a face from database"""
-        conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("DELETE FROM faces WHERE name = ?", (name,))
+            with timed_stage('db_write'), self.db.transaction() as conn:
+                deleted = conn.execute("DELETE FROM faces WHERE name = ?", (name,)).rowcount
             
-            if cursor.rowcount > 0:
-                conn.commit()
+            if deleted > 0:
+                self.gallery_store.delete(name)
                 
                 # Remove from in-memory storage
-                if name in self.known_face_names:
-                    idx = self.known_face_names.index(name)
-                    del self.known_face_names[idx]
-                    del self.known_face_encodings[idx]
+                self.gallery.remove(name)
+                self.publish_gallery()
                 
-                self.save_encodings()
                 logger.info(f"Deleted face: {name}")
                 return True, f"Successfully deleted {name}"
             else:
@@ -408,83 +3118,311 @@ class FaceRecognitionSystem:
         except Exception as e:
             logger.error(f"Delete error: {e}")
             return False, f"Delete failed: {str(e)}"
-        finally:
-            if conn:
-                conn.close()
                 
     def get_all_faces(self):
         """Get list of all enrolled faces"""
-        conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT name, images_count, created_at FROM faces ORDER BY name")
-            faces = cursor.fetchall()
+            with self.db.connection() as conn:
+                faces = conn.execute("SELECT name, images_count, created_at FROM faces ORDER BY name").fetchall()
             
             return [{"name": face[0], "images_count": face[1], "created_at": face[2]} for face in faces]
             
         except Exception as e:
             logger.error(f"Error getting faces: {e}")
             return []
-        finally:
-            if conn:
-                conn.close()
                 
     def log_recognition(self, name, confidence, domain_used="unknown"):
-        """Log recognition event with domain info"""
-        conn = None
+        """Log recognition event with domain info (queued, written in batches)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "INSERT INTO recognition_logs (name, confidence, domain_used) VALUES (?, ?, ?)",
-                (name, confidence, domain_used)
-            )
-            conn.commit()
-            
+            self.rolling_stats.record_recognition(domain_used, confidence)
+            self.log_writer.log_recognition(name, confidence, domain_used)
         except Exception as e:
             logger.error(f"Logging error: {e}")
-        finally:
-            if conn:
-                conn.close()
+
+# Bounded worker pool for detection/encoding work fanned out from request threads
+inference_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('INFERENCE_WORKERS', str(os.cpu_count() or 4))),
+    thread_name_prefix='inference'
+)
+BATCH_MAX_IMAGES = int(os.getenv('BATCH_MAX_IMAGES', '16'))
+
+# Per-image limits, checked on the encoded bytes and header before decoding
+MAX_IMAGE_BYTES = int(os.getenv('MAX_IMAGE_BYTES', str(8 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', str(16 * 1000 * 1000)))
+
+# Large JPEGs are decoded at 1/2 or 1/4 scale in the DCT domain as long as a face
+# covering DECODE_FACE_FRACTION of the short side keeps DECODE_TARGET_FACE_PX pixels
+# (0 always decodes at full resolution)
+DECODE_TARGET_FACE_PX = int(os.getenv('DECODE_TARGET_FACE_PX', '100'))
+DECODE_FACE_FRACTION = float(os.getenv('DECODE_FACE_FRACTION', '0.2'))
 
 # Initialize face recognition system
 face_system = FaceRecognitionSystem()
 
-def process_image_from_request(request):
-    """Process image from Flask request"""
+# Server-side recognition of the ESP32 MJPEG stream, pushed over SSE
+stream_recognizer = StreamRecognizer(
+    face_system,
+    min_interval=float(os.getenv('STREAM_MIN_INTERVAL', '0.2')),
+    duty_cycle=float(os.getenv('STREAM_DUTY_CYCLE', '0.5'))
+)
+if not IN_WORKER_PROCESS and os.getenv('STREAM_RECOGNITION', '0') == '1':
+    stream_recognizer.start()
+
+# Scrape-time gauges for /metrics
+_in_flight_requests = 0
+_in_flight_lock = threading.Lock()
+
+def _cache_events():
+    stats = face_system.result_cache.stats() if face_system.result_cache is not None else {"hits": 0, "misses": 0}
+    return {('hit',): stats["hits"], ('miss',): stats["misses"]}
+
+def _log_rows():
+    return {('written',): face_system.log_writer.written, ('dropped',): face_system.log_writer.dropped}
+
+metrics.gauge('eco_home_cold_start_seconds', 'Seconds from process start until every component was ready',
+              lambda: face_system.readiness.cold_start or 0.0)
+metrics.gauge('eco_home_component_load_seconds', 'Startup load time per component',
+              lambda: {(name,): state["seconds"] or 0.0
+                       for name, state in face_system.readiness.snapshot()["components"].items()},
+              ('component',))
+metrics.gauge('eco_home_in_flight_requests', 'HTTP requests currently being served', lambda: _in_flight_requests)
+metrics.gauge('eco_home_gallery_size', 'Enrolled identities in the gallery', lambda: len(face_system.gallery))
+metrics.gauge('eco_home_inference_queue_depth', 'Tasks waiting for an inference thread',
+              lambda: inference_executor._work_queue.qsize())
+metrics.gauge('eco_home_log_queue_depth', 'Log rows waiting for the background writer',
+              lambda: face_system.log_writer.queue_depth)
+metrics.gauge('eco_home_log_rows_total', 'Log rows written or dropped by the background writer',
+              _log_rows, ('outcome',), kind='counter')
+metrics.gauge('eco_home_result_cache_lookups_total', 'Recognition result cache lookups', _cache_events, ('outcome',), kind='counter')
+def _gate_counts():
+    counts = face_system.gate.stats() if face_system.gate is not None else {}
+    return {tuple(key.split(':', 1)): count for key, count in counts.items() if ':' in key}
+
+metrics.gauge('eco_home_gate_rejects_total', 'Frames rejected by the cascade gate', _gate_counts,
+              ('stage', 'reason'), kind='counter')
+metrics.gauge('eco_home_gate_passed_total', 'Frames passed on by the cascade gate',
+              lambda: face_system.gate.stats()["passed"] if face_system.gate is not None else 0, kind='counter')
+metrics.gauge('eco_home_face_tracks', 'Live cross-frame face tracks',
+              lambda: face_system.tracker.stats()["tracks"] if face_system.tracker is not None else 0)
+metrics.gauge('eco_home_stream_subscribers', 'Connected stream event subscribers',
+              lambda: stream_recognizer.status()["subscribers"])
+
+def sniff_image_format(data):
+    """'jpeg', 'png', 'bmp' or 'webp' from the magic bytes, None for anything else"""
+    head = bytes(data[:12])
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith(b'BM'):
+        return 'bmp'
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+def jpeg_dimensions(data):
+    """(width, height) from the first SOF marker of a JPEG, None if not found"""
+    view = memoryview(data)
+    offset, size = 2, len(view)
+    while offset + 4 <= size:
+        if view[offset] != 0xFF:
+            return None
+        marker = view[offset + 1]
+        if marker == 0xFF:  # fill byte
+            offset += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # standalone markers
+            offset += 2
+            continue
+        length = (view[offset + 2] << 8) | view[offset + 3]
+        # SOF0-SOF15, excluding DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if offset + 9 > size:
+                return None
+            height = (view[offset + 5] << 8) | view[offset + 6]
+            width = (view[offset + 7] << 8) | view[offset + 8]
+            return width, height
+        if marker == 0xDA:  # start of scan without a frame header
+            return None
+        offset += 2 + length
+    return None
+
+def image_dimensions(data, image_format):
+    """(width, height) read from the header without decoding, None when unknown"""
+    if image_format == 'jpeg':
+        return jpeg_dimensions(data)
+    if image_format == 'png' and len(data) >= 24:
+        return int.from_bytes(bytes(data[16:20]), 'big'), int.from_bytes(bytes(data[20:24]), 'big')
+    return None
+
+def reduced_decode_flag(width, height):
+    """IMREAD_COLOR, or IMREAD_REDUCED_COLOR_2/4 when the expected face stays large enough"""
+    if DECODE_TARGET_FACE_PX <= 0:
+        return cv2.IMREAD_COLOR
+    face_px = min(width, height) * DECODE_FACE_FRACTION
+    for factor, flag in ((4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if face_px / factor >= DECODE_TARGET_FACE_PX:
+            return flag
+    return cv2.IMREAD_COLOR
+
+def decode_image_bytes(data, reduce=True):
+    """Decode an encoded image buffer into a BGR array (None if rejected or undecodable)
+
+    Unknown formats and payloads over MAX_IMAGE_BYTES / MAX_IMAGE_PIXELS are
+    rejected from the bytes and header alone; large JPEGs are decoded at a
+    reduced scale when reduce is set.
+    """
+    if data is None or len(data) == 0:
+        return None
+    image_format = sniff_image_format(data)
+    if image_format is None:
+        logger.warning("Rejected image: not a JPEG, PNG, BMP or WebP payload")
+        return None
+    if len(data) > MAX_IMAGE_BYTES:
+        logger.warning(f"Rejected image: {len(data)} bytes exceeds {MAX_IMAGE_BYTES}")
+        return None
+    
+    flags = cv2.IMREAD_COLOR
+    dimensions = image_dimensions(data, image_format)
+    if dimensions is not None:
+        width, height = dimensions
+        if width * height > MAX_IMAGE_PIXELS:
+            logger.warning(f"Rejected image: {width}x{height} exceeds {MAX_IMAGE_PIXELS} pixels")
+            return None
+        if reduce and image_format == 'jpeg':
+            flags = reduced_decode_flag(width, height)
+    
+    with timed_stage('decode'):
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), flags)
+    if image is not None and dimensions is None and image.shape[0] * image.shape[1] > MAX_IMAGE_PIXELS:
+        logger.warning(f"Rejected image: {image.shape[1]}x{image.shape[0]} exceeds {MAX_IMAGE_PIXELS} pixels")
+        return None
+    return image
+
+def decode_base64_image(image_data):
+    """Decode a base64 string or data URL into a BGR array"""
+    return decode_image_bytes(decode_base64_payload(image_data))
+
+def decode_base64_payload(image_data):
+    """Raw bytes of a base64 string or data URL (None if malformed or oversize)
+
+    a2b_base64 reads the ASCII str directly, skipping the intermediate bytes
+    copy b64decode makes; pure Python cannot decode into an existing buffer.
+    """
+    start = 0
+    if image_data.startswith('data:'):
+        start = image_data.find(',') + 1
+        if start == 0:
+            return None
+    if (len(image_data) - start) * 3 // 4 > MAX_IMAGE_BYTES:
+        logger.warning(f"Rejected base64 image: decoded size exceeds {MAX_IMAGE_BYTES} bytes")
+        return None
+    try:
+        return binascii.a2b_base64(image_data[start:] if start else image_data)
+    except (binascii.Error, ValueError) as e:
+        logger.warning(f"Rejected base64 image: {e}")
+        return None
+
+def read_upload(file):
+    """Bytes of an uploaded file, or None when it is over MAX_IMAGE_BYTES"""
+    stream = file.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    if size > MAX_IMAGE_BYTES:
+        logger.warning(f"Rejected upload {file.filename}: {size} bytes exceeds {MAX_IMAGE_BYTES}")
+        return None
+    return stream.read()
+
+def read_image_payload(request):
+    """Encoded image bytes from a Flask request (multipart file or base64 form field)"""
     try:
         if 'image' in request.files:
             file = request.files['image']
             if file.filename != '':
-                file_bytes = np.frombuffer(file.read(), np.uint8)
-                image = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-                return image
+                return read_upload(file)
         
         elif 'image' in request.form:
-            image_data = request.form['image']
-            if image_data.startswith('data:image'):
-                image_data = image_data.split(',')[1]
-            
-            image_bytes = base64.b64decode(image_data)
-            image_array = np.frombuffer(image_bytes, np.uint8)
-            image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-            return image
+            return decode_base64_payload(request.form['image'])
             
         return None
     except Exception as e:
         logger.error(f"Image processing error: {e}")
         return None
 
+def process_image_from_request(request):
+    """Process image from Flask request"""
+    try:
+        data = read_image_payload(request)
+        return decode_image_bytes(data) if data is not None else None
+    except Exception as e:
+        logger.error(f"Image processing error: {e}")
+        return None
+
+@app.before_request
+def start_request_metrics():
+    global _in_flight_requests
+    g.request_start = time.perf_counter()
+    with _in_flight_lock:
+        _in_flight_requests += 1
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get('request_start')
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        HTTP_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    global _in_flight_requests
+    if g.get('request_start') is not None:
+        with _in_flight_lock:
+            _in_flight_requests -= 1
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage latencies, request counters and queue gauges in Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Per-component readiness; 503 until the database, gallery and models are loaded"""
+    state = face_system.readiness.snapshot()
+    return jsonify(state), 200 if state["ready"] else 503
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint with domain separation info"""
     return jsonify({
         "status": "healthy",
-        "enrolled_faces": len(face_system.known_face_names),
+        "enrolled_faces": len(face_system.gallery),
         "recognition_threshold": face_system.recognition_threshold,
+        "index_mode": face_system.index_mode,
+        "inference_backend": face_system.inference_backend,
+        "log_writer": {
+            "queued": face_system.log_writer.queue_depth,
+            "written": face_system.log_writer.written,
+            "dropped": face_system.log_writer.dropped
+        },
+        "database": face_system.db.stats(),
+        "capture_cache": get_capture_coalescer(face_system.esp32_local_ip).stats(),
+        "tracking": face_system.tracker.stats() if face_system.tracker is not None else None,
+        "result_cache": face_system.result_cache.stats() if face_system.result_cache is not None else None,
+        "frame_gate": face_system.gate.stats() if face_system.gate is not None else None,
+        "detection": {
+            "scale": face_system.detect_scale,
+            "mode": face_system.detect_mode,
+            "passes": {
+                label: {
+                    "calls": stats["calls"],
+                    "hits": stats["hits"],
+                    "avg_ms": stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0
+                } for label, stats in list(face_system.detection_stats.items())
+            }
+        },
         "domain_separation": {
             "stream_domain": face_system.esp32_stream_domain,
             "api_domain": face_system.esp32_api_domain,
@@ -506,7 +3444,7 @@ def enroll_face():
         
         logger.info(f"Starting enrollment for: {name}")
         
-        # Get images
+        # Get images (raw bytes; decoding happens in the enrollment pipeline)
         images = []
         
         for i in range(10):
@@ -515,10 +3453,9 @@ def enroll_face():
                 file = request.files[file_key]
                 if file.filename != '':
                     try:
-                        file_bytes = np.frombuffer(file.read(), np.uint8)
-                        image = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-                        if image is not None:
-                            images.append(image)
+                        data = read_upload(file)
+                        if data:
+                            images.append(data)
                             logger.info(f"Successfully loaded image {file_key}")
                     except Exception as e:
                         logger.error(f"Error processing image {file_key}: {e}")
@@ -561,16 +3498,45 @@ def recognize_face():
         return '', 204
         
     try:
-        image = process_image_from_request(request)
-        if image is None:
+        data = read_image_payload(request)
+        if not data:
             return jsonify({"success": False, "message": "No valid image provided"}), 400
         
+        # Worker processes decode for themselves; the threaded path decodes here
+        image = None
+        if face_system.backend is None:
+            image = decode_image_bytes(data)
+            if image is None:
+                return jsonify({"success": False, "message": "No valid image provided"}), 400
+        
         logger.info("Starting face recognition...")
         
         # Determine which domain was used (based on referrer or custom header)
         domain_used = request.headers.get('X-Domain-Used', 'api_domain')
         
-        name, confidence, message, liveness_passed = face_system.recognize_face(image, domain_used)
+        # Frames from the same camera share face tracks and cached matches; without an explicit id
+        # nothing is reused (behind the tunnel every client shares one address, so remote_addr is no camera identity)
+        camera_id = request.headers.get('X-Camera-Id') or request.form.get('camera_id') or None
+        
+        # The gate runs first: dark, blurred and face-less frames stop before detection
+        if image is not None:
+            result, rejection = face_system.recognize_face_gated(image, domain_used, camera_id)
+        else:
+            result, rejection = face_system.recognize_image_bytes_gated(data, domain_used, camera_id)
+        if rejection is not None:
+            logger.info(f"Frame rejected at {rejection.stage}: {rejection.reason}")
+            return jsonify({
+                "success": False,
+                "name": "Unknown",
+                "confidence": 0.0,
+                "message": rejection.message,
+                "reject_stage": rejection.stage,
+                "reject_reason": rejection.reason,
+                "domain_used": domain_used,
+                "timestamp": datetime.now().isoformat()
+            })
+        
+        name, confidence, message, liveness_passed = result
         
         if name is not None and name != "Unknown" and liveness_passed:
             logger.info(f"Recognition successful: {name} ({confidence:.2f})")
@@ -599,6 +3565,81 @@ def recognize_face():
         logger.error(f"Recognize endpoint error: {e}")
         return jsonify({"success": False, "message": f"Server error: {str(e)}"}), 500
 
+@app.route('/recognize/batch', methods=['POST', 'OPTIONS'])
+def recognize_batch():
+    """Recognize several faces in one round trip (multipart files or JSON base64 array)"""
+    if request.method == 'OPTIONS':
+        return '', 204
+        
+    try:
+        # Count the entries before reading any of them, so an oversized batch costs nothing
+        if request.files:
+            entries = [file for key in request.files for file in request.files.getlist(key)]
+        else:
+            data = request.get_json(silent=True) or {}
+            entries = data.get('images', [])
+            if not isinstance(entries, list):
+                return jsonify({"success": False, "message": "images must be a list of base64 strings"}), 400
+        if len(entries) > BATCH_MAX_IMAGES:
+            return jsonify({"success": False, "message": f"Too many images (max {BATCH_MAX_IMAGES})"}), 400
+        
+        # One slot per input entry; None marks an entry that is not an image
+        if request.files:
+            decode_jobs = [
+                (decode_image_bytes, read_upload(file)) if file.filename != '' else None
+                for file in entries
+            ]
+        else:
+            decode_jobs = [
+                (decode_base64_image, image_data) if isinstance(image_data, str) else None
+                for image_data in entries
+            ]
+        
+        if not any(job is not None for job in decode_jobs):
+            return jsonify({"success": False, "message": "No valid images provided"}), 400
+        
+        # Decode concurrently, keeping request order
+        futures = [
+            inference_executor.submit(job[0], job[1]) if job is not None else None
+            for job in decode_jobs
+        ]
+        images = []
+        for i, future in enumerate(futures):
+            if future is None:
+                images.append(None)
+                continue
+            try:
+                images.append(future.result())
+            except Exception as e:
+                logger.error(f"Batch image {i} decode error: {e}")
+                images.append(None)
+        
+        domain_used = request.headers.get('X-Domain-Used', 'api_domain')
+        logger.info(f"Starting batch recognition of {len(images)} images...")
+        
+        results = face_system.recognize_batch(images, domain_used)
+        
+        return jsonify({
+            "success": True,
+            "count": len(results),
+            "recognized": sum(1 for result in results if result[3]),
+            "results": [
+                {
+                    "index": i,
+                    "success": success,
+                    "name": name if name else "Unknown",
+                    "confidence": float(confidence) if confidence else 0.0,
+                    "message": message
+                } for i, (name, confidence, message, success) in enumerate(results)
+            ],
+            "domain_used": domain_used,
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Batch recognize endpoint error: {e}")
+        return jsonify({"success": False, "message": f"Server error: {str(e)}"}), 500
+
 @app.route('/delete', methods=['POST', 'OPTIONS'])
 def delete_face():
     """Delete a face from database"""
@@ -640,51 +3681,108 @@ def list_faces():
 
 @app.route('/logs', methods=['GET'])
 def get_logs():
-    """Get recognition logs with domain info"""
-    conn = None
+    """Get recognition logs with domain info, newest first.
+
+    Pass the returned next_cursor back as ?cursor= to fetch the following page;
+    pages are seeked through the timestamp index instead of using OFFSET.
+    """
     try:
-        conn = sqlite3.connect(face_system.db_path)
-        cursor = conn.cursor()
+        limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+        cursor = request.args.get('cursor', '')
         
-        limit = request.args.get('limit', 50, type=int)
-        cursor.execute(
-            "SELECT name, confidence, timestamp, domain_used FROM recognition_logs ORDER BY timestamp DESC LIMIT ?",
-            (limit,)
-        )
+        with face_system.db.connection() as conn:
+            if cursor:
+                try:
+                    cursor_timestamp, cursor_id = cursor.rsplit('|', 1)
+                    cursor_id = int(cursor_id)
+                except ValueError:
+                    return jsonify({"success": False, "message": "Invalid cursor"}), 400
+                logs = conn.execute(
+                    """SELECT id, name, confidence, timestamp, domain_used FROM recognition_logs
+                       WHERE (timestamp, id) < (?, ?)
+                       ORDER BY timestamp DESC, id DESC LIMIT ?""",
+                    (cursor_timestamp, cursor_id, limit)
+                ).fetchall()
+            else:
+                logs = conn.execute(
+                    "SELECT id, name, confidence, timestamp, domain_used FROM recognition_logs ORDER BY timestamp DESC, id DESC LIMIT ?",
+                    (limit,)
+                ).fetchall()
         
-        logs = cursor.fetchall()
+        next_cursor = f"{logs[-1][3]}|{logs[-1][0]}" if len(logs) == limit else None
         
         return jsonify({
             "success": True,
-            "logs": [{"name": log[0], "confidence": log[1], "timestamp": log[2], "domain_used": log[3] or "unknown"} for log in logs]
+            "logs": [{"name": log[1], "confidence": log[2], "timestamp": log[3], "domain_used": log[4] or "unknown"} for log in logs],
+            "next_cursor": next_cursor
         })
         
     except Exception as e:
         logger.error(f"Logs endpoint error: {e}")
         return jsonify({"success": False, "message": f"Server error: {str(e)}"}), 500
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/proxy/capture', methods=['GET', 'OPTIONS'])
 def proxy_capture():
-    """Enhanced proxy endpoint with domain separation support"""
+    """Enhanced proxy endpoint with domain separation support
+
+    Concurrent callers share one upstream fetch and recently fetched frames are
+    reused for CAPTURE_CACHE_TTL_MS; X-Frame-Age tells how old the frame is.
+    """
     if request.method == 'OPTIONS':
         return '', 204
         
     start_time = time.time()
     
+    # Return image data with proper CORS headers
+    headers = {
+        'Content-Type': 'image/jpeg',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Expose-Headers': 'X-Frame-Age, X-Capture-Cache, X-Response-Time',
+        'Cache-Control': 'no-cache, no-store, must-revalidate',
+        'Pragma': 'no-cache',
+        'Expires': '0',
+        'X-Domain-Used': 'api_domain'
+    }
+    
+    coalescer = get_capture_coalescer(face_system.esp32_local_ip)
+    kind, value, fetched_at = coalescer.acquire()
+    
+    if kind == "hit":
+        headers.update({
+            'Content-Length': str(len(value)),
+            'X-Capture-Cache': 'HIT',
+            'X-Frame-Age': str(int((time.time() - fetched_at) * 1000)),
+            'X-Response-Time': str(time.time() - start_time)
+        })
+        return value, 200, headers
+    
+    if kind == "follow":
+        fetch = value
+        if not fetch.done.wait(coalescer.wait_timeout) or fetch.frame is None:
+            message = fetch.error or "Timed out waiting for in-flight capture"
+            return jsonify({"success": False, "message": f"Cannot capture from ESP32-CAM API domain: {message}"}), 500
+        headers.update({
+            'Content-Length': str(len(fetch.frame)),
+            'X-Capture-Cache': 'COALESCED',
+            'X-Frame-Age': str(int((time.time() - fetch.fetched_at) * 1000)),
+            'X-Response-Time': str(time.time() - start_time)
+        })
+        return fetch.frame, 200, headers
+    
+    fetch = value
     try:
         # Use API domain for capture
-        esp32_url = f"http://{face_system.esp32_local_ip}"
+        client = get_camera_client(face_system.esp32_local_ip)
         
-        logger.info(f"Proxying capture request to {esp32_url} (API domain)")
+        logger.info(f"Proxying capture request to {client.base_url} (API domain)")
         
-        # Make request to ESP32-CAM via API domain
-        response = requests.get(
-            f"{esp32_url}/capture",
-            timeout=10,
-            params={"t": int(time.time()), "proxy": 1, "api_domain": 1}
+        # Make request to ESP32-CAM via API domain; the body is relayed as it arrives
+        response = client.get(
+            "/capture",
+            params={"t": int(time.time()), "proxy": 1, "api_domain": 1},
+            stream=True
         )
         
         response_time = time.time() - start_time
@@ -693,20 +3791,34 @@ def proxy_capture():
             # Log successful domain access
             face_system.log_domain_access("api_domain", "/capture", "success", response_time)
             
-            # Return image data with proper CORS headers
-            return response.content, 200, {
-                'Content-Type': 'image/jpeg',
-                'Content-Length': str(len(response.content)),
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0',
-                'X-Domain-Used': 'api_domain',
+            def relay():
+                # Tee the stream so waiting callers and the cache get the same frame
+                chunks = []
+                try:
+                    for chunk in response.iter_content(chunk_size=CAPTURE_CHUNK_SIZE):
+                        chunks.append(chunk)
+                        yield chunk
+                    coalescer.complete(fetch, b''.join(chunks))
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"Proxy capture stream error: {e}")
+                    coalescer.fail(fetch, str(e))
+                finally:
+                    response.close()
+            
+            headers.update({
+                'X-Capture-Cache': 'MISS',
+                'X-Frame-Age': '0',
                 'X-Response-Time': str(response_time)
-            }
+            })
+            if response.headers.get('Content-Length'):
+                headers['Content-Length'] = response.headers['Content-Length']
+            relayed = Response(relay(), 200, headers)
+            # Release waiters even if the client disconnects before the body is read
+            relayed.call_on_close(lambda: coalescer.fail(fetch, "Capture relay aborted"))
+            return relayed
         else:
+            response.close()
+            coalescer.fail(fetch, f"upstream returned {response.status_code}")
             face_system.log_domain_access("api_domain", "/capture", "error", response_time)
             return jsonify({
                 "success": False, 
@@ -714,6 +3826,7 @@ def proxy_capture():
             }), 500
             
     except requests.exceptions.RequestException as e:
+        coalescer.fail(fetch, str(e))
         response_time = time.time() - start_time
         face_system.log_domain_access("api_domain", "/capture", "timeout", response_time)
         
@@ -723,9 +3836,53 @@ def proxy_capture():
             "message": f"Cannot connect to ESP32-CAM API domain: {str(e)}. Check IP and WiFi."
         }), 500
     except Exception as e:
+        coalescer.fail(fetch, str(e))
         logger.error(f"Proxy capture error: {e}")
         return jsonify({"success": False, "message": f"Proxy error: {str(e)}"}), 500
 
+@app.route('/stream/recognition', methods=['GET', 'POST', 'OPTIONS'])
+def stream_recognition_control():
+    """Start/stop server-side recognition of the ESP32 stream, or report its status"""
+    if request.method == 'OPTIONS':
+        return '', 204
+        
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            if data.get('enabled', True):
+                stream_recognizer.start()
+            else:
+                stream_recognizer.stop()
+        
+        return jsonify({"success": True, **stream_recognizer.status()})
+        
+    except Exception as e:
+        logger.error(f"Stream recognition control error: {e}")
+        return jsonify({"success": False, "message": f"Server error: {str(e)}"}), 500
+
+@app.route('/stream/events', methods=['GET'])
+def stream_events():
+    """Server-Sent Events feed of stream recognition results"""
+    subscriber = stream_recognizer.subscribe()
+    
+    def events():
+        try:
+            yield f"event: status\ndata: {json.dumps(stream_recognizer.status())}\n\n"
+            while True:
+                try:
+                    result = subscriber.get(timeout=15)
+                    yield f"event: recognition\ndata: {json.dumps(result)}\n\n"
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            stream_recognizer.unsubscribe(subscriber)
+    
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        'Access-Control-Allow-Origin': '*'
+    })
+
 @app.route('/config/esp32_ip', methods=['POST', 'GET', 'OPTIONS'])
 def config_esp32_ip():
     """Configure ESP32-CAM IP address for domain separation"""
@@ -748,10 +3905,11 @@ def config_esp32_ip():
             
             # Test both domains
             results = {}
+            client = get_camera_client(ip)
             
             # Test API domain
             try:
-                api_response = requests.get(f"http://{ip}/status", timeout=5)
+                api_response = client.get("/status", timeout=(client.timeout[0], 5))
                 results['api_domain'] = {
                     "status": "online" if api_response.status_code == 200 else "error",
                     "response_code": api_response.status_code
@@ -761,7 +3919,7 @@ def config_esp32_ip():
             
             # Test basic connectivity (stream domain uses same IP)
             try:
-                basic_response = requests.head(f"http://{ip}", timeout=3)
+                basic_response = client.head("/", timeout=(client.timeout[0], 3))
                 results['basic_connectivity'] = "ok"
             except Exception as e:
                 results['basic_connectivity'] = "failed"
@@ -793,60 +3951,21 @@ def config_esp32_ip():
 
 @app.route('/domain/stats', methods=['GET'])
 def domain_statistics():
-    """Get domain separation statistics"""
-    conn = None
+    """Get domain separation statistics (rolling 24h window kept in memory)"""
     try:
-        conn = sqlite3.connect(face_system.db_path)
-        cursor = conn.cursor()
-        
-        # Get domain access stats
-        cursor.execute("""
-            SELECT domain, endpoint, status, COUNT(*) as count, AVG(response_time) as avg_time
-            FROM domain_logs 
-            WHERE timestamp > datetime('now', '-24 hours')
-            GROUP BY domain, endpoint, status
-            ORDER BY count DESC
-        """)
-        
-        domain_stats = cursor.fetchall()
-        
-        # Get recognition stats by domain
-        cursor.execute("""
-            SELECT domain_used, COUNT(*) as count, AVG(confidence) as avg_confidence
-            FROM recognition_logs 
-            WHERE timestamp > datetime('now', '-24 hours')
-            GROUP BY domain_used
-        """)
-        
-        recognition_stats = cursor.fetchall()
+        domain_stats, recognition_stats = face_system.rolling_stats.snapshot()
         
         return jsonify({
             "success": True,
-            "domain_access_stats": [
-                {
-                    "domain": stat[0], 
-                    "endpoint": stat[1], 
-                    "status": stat[2], 
-                    "count": stat[3], 
-                    "avg_response_time": stat[4]
-                } for stat in domain_stats
-            ],
-            "recognition_stats": [
-                {
-                    "domain_used": stat[0] or "unknown", 
-                    "count": stat[1], 
-                    "avg_confidence": stat[2]
-                } for stat in recognition_stats
-            ],
+            "domain_access_stats": domain_stats,
+            "recognition_stats": recognition_stats,
+            "window_minutes": face_system.rolling_stats.window,
             "timestamp": datetime.now().isoformat()
         })
         
     except Exception as e:
         logger.error(f"Domain stats error: {e}")
         return jsonify({"success": False, "message": f"Server error: {str(e)}"}), 500
-    finally:
-        if conn:
-            conn.close()
 
 if __name__ == '__main__':
     # Create necessary directories
@@ -887,9 +4006,9 @@ if __name__ == '__main__':
         exit(1)
     
     print("✓ All dependencies OK")
-    print(f"Enrolled faces: {len(face_system.known_face_names)}")
-    if len(face_system.known_face_names) > 0:
-        print(f"Known faces: {', '.join(face_system.known_face_names)}")
+    print(f"Enrolled faces: {len(face_system.gallery)}")
+    if len(face_system.gallery) > 0:
+        print(f"Known faces: {', '.join(face_system.gallery.names)}")
     
     print("\n=== Domain Separation Configuration ===")
     print(f"Stream Domain: {face_system.esp32_stream_domain}")
@@ -910,14 +4029,19 @@ if __name__ == '__main__':
     print("  • ESP32-CAM IP configuration with domain testing")
     print("\nAvailable endpoints:")
     print("  GET  /health - Health check with domain info")
+    print("  GET  /ready - Per-component readiness (503 while warming up)")
     print("  POST /enroll - Enroll new face")
     print("  POST /recognize - Recognize face (with domain tracking)")
+    print("  POST /recognize/batch - Recognize several faces in one request")
     print("  POST /delete - Delete face")
     print("  GET  /list - List all faces")
     print("  GET  /logs - Get recognition logs (with domain info)")
     print("  GET  /proxy/capture - Enhanced capture via API domain")
     print("  POST /config/esp32_ip - Configure ESP32-CAM IP with domain testing")
     print("  GET  /domain/stats - Domain separation statistics")
+    print("  GET  /metrics - Prometheus metrics (stage latencies, queues)")
+    print("  GET/POST /stream/recognition - Server-side stream recognition status/control")
+    print("  GET  /stream/events - Stream recognition results (Server-Sent Events)")
     print("\n=== Ready for Domain Separated Face Recognition ===")
     
     app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)